@@ -1,85 +1,94 @@
 import pandas as pd
 import numpy as np
 
-df_artemis = pd.read_excel('../data/artemis/artemis_data.xlsx')
-df_pred    = pd.read_excel('../data/interval_data/interval_analysis_applied.xlsx')
+from artemis_data import load_canonical
+from intermediate_store import load_frame, save_frame
 
-df_artemis = df_artemis.drop(columns=[
-    "Student ID",
-    "Rating", "Rating.1", "Rating.2", "Rating.3",
-    "Cumulative GPA",
-    "Budget Requested (USD)"
-], errors="ignore")
+PREDICTIONS_FILE = '../data/interval_data/interval_analysis_applied.xlsx'
+OUTPUT_FILE = "../data/artemis/artemis_data_for_DP.xlsx"
 
-df_artemis = df_artemis.rename(columns={
-    "Measurable: How many people do you plan to affect?": "participants",
-    "Timebound: How many operating days will the project have?": "duration",
-    "How many people will you need on your team? (staff, volunteers)": "staff",
-    "Greenlit Budget": "budget",
-    "Sum": "rating",
-    "What is the thematic premise of your project?": "theme",
-    "In which country will your project take place?": "country"
-})
+MIN_SPREAD_FACTOR = 0.05
+MAX_SPREAD_FACTOR = 1.00
+RATING_INFLECTION = 70
 
-numeric_df = df_artemis.select_dtypes(include=["number"]).drop(columns=["staff"], errors="ignore")
-df_clean = pd.concat([df_artemis[["country", "theme"]], numeric_df], axis=1)
+PRED_COLUMNS = ['participants_pred_min', 'participants_pred_mean', 'participants_pred_max']
 
-df = df_pred.copy()
 
-min_c, mean_c, max_c = (
-    'participants_pred_min',
-    'participants_pred_mean',
-    'participants_pred_max'
-)
+def adjust_participants(projects, predictions, min_spread_factor=MIN_SPREAD_FACTOR,
+                        max_spread_factor=MAX_SPREAD_FACTOR, rating_inflection=RATING_INFLECTION, on='ID'):
+    """
+    Rating-weighted participant estimates for every project.
 
-orig = df['current_participants']
+    Each project's planned participants are pulled towards a target in its
+    predicted interval, by more the narrower the interval is. The target sits
+    below the predicted mean for ratings above RATING_INFLECTION and above it
+    for ratings below it: (rating - RATING_INFLECTION) / (1 - RATING_INFLECTION)
+    is negative above the inflection, so the higher a project is rated, the
+    lower its estimate (the original script's formula, kept as is).
+    Predictions are matched to projects on the `on` column; projects without
+    one fall back to their own numbers.
 
-df[mean_c] = df[mean_c].fillna(orig)
-df[min_c]  = df[min_c].fillna(df[mean_c])
-df[max_c]  = df[max_c].fillna(df[mean_c])
+    The factors may also be 1-D arrays of settings (broadcast against each
+    other); the result is then a (settings, projects) integer array instead of
+    a Series aligned with projects.
+    """
+    pred = predictions.drop_duplicates(on).set_index(on).reindex(projects[on])
+    orig = projects['participants'].to_numpy(dtype=float)
+    rating = projects['rating'].to_numpy(dtype=float)
+    low, mean, high = (pred[col].to_numpy(dtype=float) for col in PRED_COLUMNS)
 
-df[min_c] = np.minimum(df[min_c], df[mean_c])
-df[max_c] = np.maximum(df[max_c], df[mean_c])
+    mean = np.where(np.isnan(mean), orig, mean)
+    low = np.where(np.isnan(low), mean, low)
+    high = np.where(np.isnan(high), mean, high)
+    low = np.clip(np.minimum(low, mean), 0, None)
+    high = np.clip(np.maximum(high, mean), 0, None)
+    mean = np.clip(mean, 0, None)
 
-df[[min_c, mean_c, max_c]] = df[[min_c, mean_c, max_c]].clip(lower=0)
+    min_spread_factor, max_spread_factor, rating_inflection = (
+        np.asarray(f, dtype=float)[..., None] for f in (min_spread_factor, max_spread_factor, rating_inflection)
+    )
 
-spread = df[max_c] - df[min_c]
+    min_spread = np.clip(mean * min_spread_factor, 1e-6, None)
+    max_spread = np.maximum(mean * max_spread_factor, min_spread)
+    spread = np.minimum(np.maximum(high - low, min_spread), max_spread)
 
-MIN_SPREAD_FACTOR = 0.05
-MAX_SPREAD_FACTOR = 1.00
+    lower = np.clip(mean - spread / 2, 0, None)
+    upper = mean + spread / 2
 
-min_spread = (df[mean_c] * MIN_SPREAD_FACTOR).clip(lower=1e-6)
-max_spread = (df[mean_c] * MAX_SPREAD_FACTOR).clip(lower=min_spread)
+    norm = np.nan_to_num(np.clip((rating - rating_inflection) / (1 - rating_inflection), -1, 1), nan=0.0)
 
-spread = spread.clip(lower=min_spread, upper=max_spread)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ci_conf = 1 / (1 + spread / np.where(mean == 0, np.nan, mean))
+    ci_conf = np.clip(np.nan_to_num(ci_conf, nan=0.05), 0.05, 0.8)
 
-lower = (df[mean_c] - spread/2).clip(lower=0)
-upper = df[mean_c] + spread/2
+    ci_target = mean + np.where(norm >= 0, norm * (upper - mean), norm * (mean - lower))
 
-RATING_INFLECTION = 70
+    adjusted = np.rint(orig * (1 - ci_conf) + ci_target * ci_conf)
+    # A project with neither participants nor a prediction has no estimate;
+    # casting its NaN to int would silently give INT_MIN.
+    missing = np.isnan(adjusted).any(axis=tuple(range(adjusted.ndim - 1)))
+    if missing.any():
+        raise ValueError(f"No participants or prediction for projects {projects[on][missing].tolist()}")
+    adjusted = adjusted.astype(int)
+    if adjusted.ndim == 1:
+        return pd.Series(adjusted, index=projects.index, name='participants')
+    return adjusted
 
-norm = (df_artemis['rating'] - RATING_INFLECTION) / (1 - RATING_INFLECTION)
-norm = norm.clip(-1, 1).fillna(0)
 
-ci_conf = spread / df[mean_c].replace(0, np.nan)
-ci_conf = 1 / (1 + ci_conf)
-ci_conf = ci_conf.fillna(0.05)
-ci_conf = ci_conf.clip(0.05, 0.8)
+def main():
+    df_artemis = load_canonical()
+    df_pred = load_frame(PREDICTIONS_FILE)
 
-ci_target = df[mean_c] + np.where(
-    norm >= 0,
-    norm * (upper - df[mean_c]),
-    norm * (df[mean_c] - lower)
-)
+    numeric_df = df_artemis.select_dtypes(include=["number"]).drop(columns=["staff"], errors="ignore")
+    df_clean = pd.concat([df_artemis[["country", "theme"]], numeric_df], axis=1)
 
-df['new_participants'] = (
-    orig * (1 - ci_conf) +
-    ci_target * ci_conf
-).round().astype(int)
+    # project_index is the row label of the application in artemis_data.xlsx
+    predictions = df_pred.assign(ID=df_artemis.loc[df_pred['project_index'], 'ID'].to_numpy())
+    df_clean['participants'] = adjust_participants(df_artemis, predictions)
 
-df_clean['participants'] = df['new_participants']
+    save_frame(df_clean, OUTPUT_FILE)
+    return df_clean, OUTPUT_FILE
 
-out_path = "../data/artemis/artemis_data_for_DP.xlsx"
-df_clean.to_excel(out_path, index=False)
 
-df_clean.head(), out_path
+if __name__ == "__main__":
+    main()
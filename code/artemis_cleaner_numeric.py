@@ -1,24 +1,9 @@
 import pandas as pd
-import re
 
-df = pd.read_excel('../data/artemis/artemis_data.xlsx')
+from artemis_data import load_canonical
+from intermediate_store import save_frame
 
-df = df.drop(columns=[
-    "Student ID",
-    "Rating", "Rating.1", "Rating.2", "Rating.3",
-    "Cumulative GPA",
-    "Budget Requested (USD)"
-], errors="ignore")
-
-df = df.rename(columns={
-    "Measurable: How many people do you plan to affect?": "participants",
-    "Timebound: How many operating days will the project have?": "duration",
-    "How many people will you need on your team? (staff, volunteers)": "staff",
-    "Greenlit Budget": "budget",
-    "Sum": "rating",
-    "What is the thematic premise of your project?": "theme",
-    "In which country will your project take place?": "country"
-})
+df = load_canonical()
 
 theme = df["theme"]
 country = df["country"]
@@ -28,6 +13,6 @@ numeric_df.drop(columns=["staff"], errors="ignore", inplace=True)
 df_clean = pd.concat([country, theme, numeric_df], axis=1)
 
 out_path = "../data/artemis/artemis_data_numeric.xlsx"
-df_clean.to_excel(out_path, index=False)
+save_frame(df_clean, out_path)
 
 df_clean.head(), out_path
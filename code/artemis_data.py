@@ -0,0 +1,119 @@
+"""
+Shared loader for the ARTeMiS application workbook.
+
+The survey export is parsed once and kept as a binary copy under the
+intermediate store, keyed by the workbook's mtime and size and, when those
+change, its content hash, so re-saving an identical file does not force a
+new parse. The copy is a pickle rather than Parquet because the survey
+columns can mix numbers and text, and they are kept exactly as read.
+
+load_canonical() drops the reviewer and personal columns and renames the
+survey questions to the short names the cleaners use.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from intermediate_store import STORE_DIR, temp_path
+from profiling import section
+
+SOURCE_PATH = "../data/artemis/artemis_data.xlsx"
+CACHE_PATH = STORE_DIR / "artemis_data.source.pkl"
+CACHE_KEY_PATH = STORE_DIR / "artemis_data.source.json"
+
+DROP_COLUMNS = [
+    "Student ID",
+    "Rating", "Rating.1", "Rating.2", "Rating.3",
+    "Cumulative GPA",
+    "Budget Requested (USD)"
+]
+CANONICAL_NAMES = {
+    "Measurable: How many people do you plan to affect?": "participants",
+    "Timebound: How many operating days will the project have?": "duration",
+    "How many people will you need on your team? (staff, volunteers)": "staff",
+    "Greenlit Budget": "budget",
+    "Sum": "rating",
+    "What is the thematic premise of your project?": "theme",
+    "In which country will your project take place?": "country"
+}
+
+_memo = {}
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cached_key():
+    if CACHE_PATH.exists() and CACHE_KEY_PATH.exists():
+        return json.loads(CACHE_KEY_PATH.read_text())
+    return None
+
+
+def _replace(path, write):
+    """Write path through a temp file of its own, so concurrent writers never share one."""
+    tmp = temp_path(path)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _write_key(key):
+    _replace(CACHE_KEY_PATH, lambda tmp: tmp.write_text(json.dumps(key, indent=2)))
+
+
+def _write_cache(df, key):
+    _replace(CACHE_PATH, df.to_pickle)
+    _write_key(key)
+
+
+def load_raw(path=SOURCE_PATH):
+    """The workbook as pandas reads it, parsed at most once per version of the file."""
+    stat = Path(path).stat()
+    key = {'source': str(path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    if _memo.get('key') == key:
+        return _memo['df'].copy()
+
+    cached = _cached_key()
+    df = None
+    if cached is not None and cached.get('source') == key['source']:
+        if cached['mtime_ns'] == key['mtime_ns'] and cached['size'] == key['size']:
+            df = pd.read_pickle(CACHE_PATH)
+        else:
+            key['sha256'] = _file_hash(path)
+            if cached.get('sha256') == key['sha256']:
+                df = pd.read_pickle(CACHE_PATH)
+                _write_key(key)
+
+    if df is None:
+        with section("excel.read"):
+            df = pd.read_excel(path)
+        key.setdefault('sha256', _file_hash(path))
+        _write_cache(df, key)
+
+    _memo.update(key=key, df=df)
+    return df.copy()
+
+
+def canonicalize(df):
+    """Drop the reviewer/personal columns and rename survey questions to short names."""
+    return df.drop(columns=DROP_COLUMNS, errors="ignore").rename(columns=CANONICAL_NAMES)
+
+
+def load_canonical(path=SOURCE_PATH):
+    return canonicalize(load_raw(path))
+
+
+if __name__ == "__main__":
+    # Run as the pipeline's first stage, so the cleaners start from a filled cache.
+    load_raw()
@@ -1,27 +1,179 @@
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler, PolynomialFeatures
+from joblib import Memory
+from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV, KFold
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler, PolynomialFeatures
+from sklearn.base import clone
 from sklearn.pipeline import Pipeline
 from sklearn.linear_model import Ridge
 from sklearn.metrics import r2_score
 
-df = pd.read_excel("../data/artemis/artemis_data_for_regression.xlsx")
+from intermediate_store import STORE_DIR, load_frame
+from rating_model import MODEL_PATH, save_model
 
-X = df.select_dtypes("number").drop(columns=["Rating"])
-y = df["Rating"]
+DATA_PATH = "../data/artemis/artemis_data_for_regression.xlsx"
+TEST_SIZE = 0.33
+RANDOM_STATE = 42
+CV_FOLDS = 5
+DEGREE = 2
+ALPHA = 10
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.33, random_state=42)
+# Transformer fits are cached on disk, so the polynomial expansion and scaling
+# of a fold are computed once and reused by every alpha tried on it.
+CACHE_DIR = STORE_DIR / "regression_cache"
+PARAM_GRID = {
+    "poly__degree": [1, 2, 3],
+    "scaler": [StandardScaler(), MinMaxScaler(), RobustScaler()],
+    "ridge__alpha": np.logspace(-2, 3, 11),
+}
+TOP_CANDIDATES = 10
+PATH_ALPHAS = np.logspace(-3, 4, 50)
 
-model = Pipeline([
-    ("poly", PolynomialFeatures(degree=2, include_bias=False)),
-    ("scaler", StandardScaler()),
-    ("ridge", Ridge(alpha=10))
-])
 
-cv_r2 = cross_val_score(model, X, y, cv=5, scoring="r2").mean()
+def load_xy(data_path=DATA_PATH):
+    df = load_frame(data_path)
+    X = df.select_dtypes("number").drop(columns=["Rating"])
+    y = df["Rating"]
+    return X, y
 
-model.fit(X_train, y_train)
-test_r2 = r2_score(y_test, model.predict(X_test))
 
-print("CV R²:", cv_r2)
-print("Test R²:", test_r2)
+def build_model(degree=DEGREE, alpha=ALPHA, scaler=None, memory=None):
+    return Pipeline([
+        ("poly", PolynomialFeatures(degree=degree, include_bias=False)),
+        ("scaler", scaler if scaler is not None else StandardScaler()),
+        ("ridge", Ridge(alpha=alpha))
+    ], memory=memory)
+
+
+def search_models(X, y, param_grid=PARAM_GRID, cv=CV_FOLDS, n_jobs=-1, cache_dir=CACHE_DIR):
+    """
+    Cross-validated grid search over degree, scaler and alpha, run across all
+    cores. Returns the fitted search and a table of candidates ranked by mean
+    CV R².
+    """
+    memory = Memory(str(cache_dir), verbose=0) if cache_dir is not None else None
+    search = GridSearchCV(
+        build_model(memory=memory), param_grid,
+        cv=KFold(cv), scoring="r2", n_jobs=n_jobs
+    )
+    search.fit(X, y)
+
+    results = search.cv_results_
+    table = pd.DataFrame({
+        "rank": results["rank_test_score"],
+        "degree": results["param_poly__degree"],
+        "scaler": [type(s).__name__ for s in results["param_scaler"]],
+        "alpha": results["param_ridge__alpha"],
+        "cv_r2": results["mean_test_score"],
+        "cv_r2_std": results["std_test_score"],
+        "fit_time": results["mean_fit_time"],
+    }).sort_values(["rank", "fit_time"]).reset_index(drop=True)
+    return search, table
+
+
+def ridge_path(X, y, alphas=PATH_ALPHAS):
+    """
+    Ridge fits (with unpenalized intercept, as Ridge does) for every alpha
+    from one SVD of the centered design matrix.
+
+    Returns coefs (n_alphas, n_features), intercepts (n_alphas,) and the
+    in-sample leave-one-out MSE and GCV score of each alpha, both closed form
+    from the hat matrix diagonal.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    alphas = np.asarray(alphas, dtype=float)
+    n = len(y)
+
+    x_mean = X.mean(axis=0)
+    y_mean = y.mean()
+    U, s, Vt = np.linalg.svd(X - x_mean, full_matrices=False)
+    Uty = U.T @ (y - y_mean)
+
+    shrink = s / (s ** 2 + alphas[:, None])                  # (n_alphas, rank)
+    coefs = (shrink * Uty) @ Vt
+    intercepts = y_mean - coefs @ x_mean
+
+    smooth = s * shrink                                      # s² / (s² + alpha)
+    fitted = y_mean + (smooth * Uty) @ U.T                   # (n_alphas, n)
+    residuals = y - fitted
+    leverage = 1 / n + smooth @ (U ** 2).T                   # hat matrix diagonal
+    loo_mse = np.mean((residuals / (1 - leverage)) ** 2, axis=1)
+    dof = 1 + smooth.sum(axis=1)
+    gcv = np.mean(residuals ** 2, axis=1) / (1 - dof / n) ** 2
+
+    return coefs, intercepts, loo_mse, gcv
+
+
+def cv_ridge_path(X, y, alphas=PATH_ALPHAS, degree=DEGREE, scaler=None, cv=CV_FOLDS):
+    """
+    Cross-validated R² of the whole regularization path: per fold the
+    polynomial expansion and scaling are fitted once, then every alpha is
+    evaluated from that fold's single SVD. Returns a table with one row per
+    alpha, including leave-one-out MSE and GCV on the full data.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    alphas = np.asarray(alphas, dtype=float)
+
+    def transformer():
+        return build_model(degree=degree, scaler=clone(scaler) if scaler is not None else None)[:-1]
+
+    fold_r2 = []
+    for train, test in KFold(cv).split(X):
+        features = transformer().fit(X[train])
+        coefs, intercepts, _, _ = ridge_path(features.transform(X[train]), y[train], alphas)
+        predictions = features.transform(X[test]) @ coefs.T + intercepts
+        ss_res = ((y[test][:, None] - predictions) ** 2).sum(axis=0)
+        ss_tot = ((y[test] - y[test].mean()) ** 2).sum()
+        fold_r2.append(1 - ss_res / ss_tot)
+    fold_r2 = np.array(fold_r2)
+
+    _, _, loo_mse, gcv = ridge_path(transformer().fit_transform(X), y, alphas)
+
+    return pd.DataFrame({
+        "alpha": alphas,
+        "cv_r2": fold_r2.mean(axis=0),
+        "cv_r2_std": fold_r2.std(axis=0),
+        "loo_mse": loo_mse,
+        "gcv": gcv,
+    })
+
+
+def main():
+    X, y = load_xy()
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+    model = build_model()
+
+    cv_r2 = cross_val_score(model, X, y, cv=CV_FOLDS, scoring="r2").mean()
+
+    model.fit(X_train, y_train)
+    test_r2 = r2_score(y_test, model.predict(X_test))
+
+    print("CV R²:", cv_r2)
+    print("Test R²:", test_r2)
+
+    final = build_model().fit(X, y)
+    save_model(final, X, y, MODEL_PATH, metrics={"cv_r2": float(cv_r2), "test_r2": float(test_r2)})
+    print("Saved model to", MODEL_PATH)
+
+    search, table = search_models(X_train, y_train)
+    best_test_r2 = r2_score(y_test, search.predict(X_test))
+
+    print(f"\nTop {TOP_CANDIDATES} of {len(table)} candidates ({CV_FOLDS}-fold CV on the training split):")
+    print(table.head(TOP_CANDIDATES).to_string(index=False))
+    print("Best:", search.best_params_)
+    print("Best Test R²:", best_test_r2)
+
+    path = cv_ridge_path(X_train, y_train)
+    best = path.loc[path["cv_r2"].idxmax()]
+    print(f"\nRidge path over {len(path)} alphas (degree {DEGREE}):")
+    print(f"Best alpha by CV R²: {best['alpha']:.4g} (CV R² {best['cv_r2']:.4f})")
+    print(f"Best alpha by LOO:   {path.loc[path['loo_mse'].idxmin(), 'alpha']:.4g}")
+    print(f"Best alpha by GCV:   {path.loc[path['gcv'].idxmin(), 'alpha']:.4g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from artemis_data import load_raw
+
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (10, 6)
 
-df = pd.read_excel('../data/artemis/artemis_data.xlsx')
+df = load_raw()
 
 print("Dataset Shape:", df.shape)
 print("\n" + "=" * 50)
@@ -6,153 +6,278 @@ import numpy as np
 from datetime import timedelta
 import matplotlib.dates as mdates
 
-def select_projects_dp(
-    filepath: str,
-    max_budget: int,
-    theme_diversity_factor: float,
-    country_diversity_factor: float,
-    max_states: int = 200_000,
-    verbose: bool = False
-) -> List[int]:
-    df = pd.read_excel(filepath)
+from intermediate_store import load_frame
+from profiling import count, profiled
+
+DATA_PATH = "../data/artemis/artemis_data_for_DP.xlsx"
+MAX_BUDGET = 9700
+THEME_DIVERSITY_FACTOR = 0.8
+COUNTRY_DIVERSITY_FACTOR = 0.95
+INCOMING_IDS = [1, 2, 3, 4, 11, 13, 22, 24, 29, 32, 36]
+TIMELINE_FREQ = 'D'
+TIMELINE_BLOCK_ROWS = 4096
+OVERLAP_BLOCK_BYTES = 4096
+
+def prepare_items(df):
+    """
+    Candidate arrays select_projects_dp solves over: project IDs, theme and
+    country codes, and integer participants and budgets. Built once per
+    candidate frame, so repeated solves (e.g. with resampled participants or
+    budgets) skip the frame handling.
+    """
     required_cols = {"ID", "country", "theme", "participants", "budget", "rating"}
     if not required_cols.issubset(set(df.columns)):
         raise ValueError(f"input file must contain columns: {required_cols}")
 
-    df = df.copy()
-    df['budget'] = df['budget'].fillna(0).astype(int)
-    df['participants'] = df['participants'].fillna(0).astype(int)
-    df['rating'] = df['rating'].fillna(0.0).astype(float)
-    df['ID'] = df['ID'].astype(object)
-
     themes = sorted(df['theme'].astype(str).unique())
     countries = sorted(df['country'].astype(str).unique())
-    theme_index = {t: i for i, t in enumerate(themes)}
-    country_index = {c: i for i, c in enumerate(countries)}
-    T = len(themes)
-    C = len(countries)
-    counts_len = T + C
-
-    items = []
-    for _, row in df.iterrows():
-        items.append({
-            'id': row['ID'],
-            'theme_idx': theme_index[str(row['theme'])],
-            'country_idx': country_index[str(row['country'])],
-            'participants': int(row['participants']),
-            'budget': int(row['budget']),
-            'rating': float(row['rating'])
-        })
-
-    n = len(items)
-
-    start_counts = tuple([0] * counts_len)
-    dp = {
-        (0, 0, start_counts): ((0.0, 0, 0), tuple())
+    theme_idx = pd.Index(themes).get_indexer(df['theme'].astype(str))
+    country_idx = pd.Index(countries).get_indexer(df['country'].astype(str))
+
+    return {
+        'ids': df['ID'].astype(object).to_numpy(),
+        'theme_idx': theme_idx,
+        'country_idx': country_idx,
+        'n_themes': len(themes),
+        'n_countries': len(countries),
+        'participants': df['participants'].fillna(0).astype(int).to_numpy(dtype=np.int64),
+        'budget': df['budget'].fillna(0).astype(int).to_numpy(dtype=np.int64),
+        'rating': df['rating'].fillna(0.0).astype(float).to_numpy(),
     }
 
-    for idx, it in enumerate(items):
-        snapshot = list(dp.items())
-        for (sel_count, budget_used, counts_tuple), (obj_tuple, sel_ids) in snapshot:
-            new_budget = budget_used + it['budget']
-            if new_budget <= max_budget:
-                new_sel = sel_count + 1
-
-                counts_list = list(counts_tuple)
-                counts_list[it['theme_idx']] += 1
-                counts_list[T + it['country_idx']] += 1
-                new_counts = tuple(counts_list)
-
-                new_rating = obj_tuple[0] + it['rating']
-                new_participants = obj_tuple[1] + it['participants']
-                new_neg_budget = obj_tuple[2] - it['budget']
-
-                new_obj = (new_rating, new_participants, new_neg_budget)
-                new_sel_ids = sel_ids + (it['id'],)
-
-                key = (new_sel, new_budget, new_counts)
-                prev = dp.get(key)
-                if (prev is None) or (new_obj > prev[0]):
-                    dp[key] = (new_obj, new_sel_ids)
-
-        if len(dp) > max_states:
-            scored = [ (v[0], k, v[1]) for k, v in dp.items() ]
-            scored.sort(reverse=True, key=lambda x: x[0])
-            kept = scored[:max_states]
-            dp = { k: (obj, sel_ids) for (obj, k, sel_ids) in kept }
-
-    best_solution = None
-    for (sel_count, budget_used, counts_tuple), (obj_tuple, sel_ids) in dp.items():
-        k = sel_count
-        if k == 0:
-            continue
-        if budget_used > max_budget:
-            continue
 
-        theme_cap = math.floor(theme_diversity_factor * k)
-        country_cap = math.floor(country_diversity_factor * k)
+def _state_keys(budget_used, counts, radix, max_budget):
+    """One integer per distinct (budget used, theme and country counts) state."""
+    span = (max_budget + 1) * math.prod(int(r) for r in radix)
+    if span < 2 ** 62:
+        weights = np.cumprod(np.concatenate([[1], radix[:-1]])).astype(np.int64)
+        return budget_used * (span // (max_budget + 1)) + counts.astype(np.int64) @ weights
+    _, keys = np.unique(np.column_stack([budget_used, counts]), axis=0, return_inverse=True)
+    return keys.ravel()
+
+
+def _best_first(rating, participants, budget_used, max_budget):
+    """
+    Stable order of states by objective, best first: rating, then
+    participants, descending, then budget used, ascending. The ratings are
+    ranked and all three packed into one integer key when it fits.
+    """
+    if len(rating) == 0:
+        return np.empty(0, dtype=np.intp)
+    _, rank = np.unique(-rating, return_inverse=True)
+    low, high = int(participants.min()), int(participants.max())
+    if (int(rank.max()) + 1) * (high - low + 1) * (max_budget + 1) >= 2 ** 62:
+        return np.lexsort((budget_used, -participants, -rating))
+    key = (rank.ravel().astype(np.int64) * (high - low + 1) + (high - participants)) * (max_budget + 1) + budget_used
+    return np.argsort(key, kind='stable')
+
+
+@profiled()
+def solve_prepared(prepared, max_budget, theme_diversity_factor, country_diversity_factor,
+                   max_states=200_000, participants=None, budget=None):
+    """
+    select_projects_dp over prepare_items() arrays, optionally with other
+    participants / budget arrays. Returns (selected positions, total budget,
+    max theme count, max country count), or None if nothing is feasible.
+
+    The DP keeps its states as parallel arrays (budget used, theme and
+    country counts, objective, chosen-item bitmask) and extends all of them
+    by an item at once. States are kept in the order a dict of them would
+    have, and ties are broken the same way, so the selection is the same.
+    """
+    participants = prepared['participants'] if participants is None else np.asarray(participants, dtype=np.int64)
+    budget = prepared['budget'] if budget is None else np.asarray(budget, dtype=np.int64)
+    rating = prepared['rating']
+    T = prepared['n_themes']
+    n = len(prepared['ids'])
+    category = np.column_stack([prepared['theme_idx'], T + prepared['country_idx']])
+    radix = np.bincount(category.ravel(), minlength=T + prepared['n_countries']) + 1
+
+    budget_used = np.zeros(1, dtype=np.int64)
+    counts = np.zeros((1, len(radix)), dtype=np.int16)
+    obj_rating = np.zeros(1)
+    obj_participants = np.zeros(1, dtype=np.int64)
+    chosen = np.zeros((1, (n + 63) // 64), dtype=np.uint64)
+
+    for idx in range(n):
+        ext = np.flatnonzero(budget_used + budget[idx] <= max_budget)
+        new_budget = budget_used[ext] + budget[idx]
+        new_counts = counts[ext]
+        new_counts[:, category[idx]] += 1
+        new_rating = obj_rating[ext] + rating[idx]
+        new_participants = obj_participants[ext] + participants[idx]
+        new_chosen = chosen[ext]
+        new_chosen[:, idx // 64] |= np.uint64(1) << np.uint64(idx % 64)
+
+        # Extensions of distinct states are distinct, so a new state can only
+        # collide with an existing one; it replaces it in place if strictly better.
+        keys = _state_keys(np.concatenate([budget_used, new_budget]), np.concatenate([counts, new_counts]),
+                           radix, max_budget)
+        old_keys, new_keys = keys[:len(budget_used)], keys[len(budget_used):]
+        sorter = np.argsort(old_keys)
+        found = sorter[np.minimum(np.searchsorted(old_keys[sorter], new_keys), len(sorter) - 1)]
+        hit = old_keys[found] == new_keys
+        old, new = found[hit], np.flatnonzero(hit)
+        better = (new_rating[new] > obj_rating[old]) | (
+            (new_rating[new] == obj_rating[old]) & (new_participants[new] > obj_participants[old]))
+        old, new = old[better], new[better]
+        obj_rating[old], obj_participants[old], chosen[old] = new_rating[new], new_participants[new], new_chosen[new]
+
+        added = ~hit
+        budget_used = np.concatenate([budget_used, new_budget[added]])
+        counts = np.concatenate([counts, new_counts[added]])
+        obj_rating = np.concatenate([obj_rating, new_rating[added]])
+        obj_participants = np.concatenate([obj_participants, new_participants[added]])
+        chosen = np.concatenate([chosen, new_chosen[added]])
+
+        count("solve_prepared.states", len(budget_used))
+        if len(budget_used) > max_states:
+            # Only states rating at least the max_states-th best can survive.
+            cutoff = np.partition(-obj_rating, max_states - 1)[max_states - 1]
+            pool = np.flatnonzero(-obj_rating <= cutoff)
+            keep = pool[_best_first(obj_rating[pool], obj_participants[pool], budget_used[pool], max_budget)]
+            keep = keep[:max_states]
+            budget_used, counts, chosen = budget_used[keep], counts[keep], chosen[keep]
+            obj_rating, obj_participants = obj_rating[keep], obj_participants[keep]
+
+    k = counts[:, :T].sum(axis=1)
+    max_theme = counts[:, :T].max(axis=1, initial=0)
+    max_country = counts[:, T:].max(axis=1, initial=0)
+    feasible = np.flatnonzero(
+        (k > 0)
+        & (max_theme <= np.floor(theme_diversity_factor * k))
+        & (max_country <= np.floor(country_diversity_factor * k))
+    )
+    if len(feasible) == 0:
+        return None
 
-        theme_counts = counts_tuple[:T]
-        country_counts = counts_tuple[T:]
-        max_theme = max(theme_counts) if theme_counts else 0
-        max_country = max(country_counts) if country_counts else 0
+    best = feasible[_best_first(obj_rating[feasible], obj_participants[feasible], budget_used[feasible], max_budget)[0]]
+    bits = np.unpackbits(chosen[best].view(np.uint8), bitorder='little')[:n]
+    return np.flatnonzero(bits), int(budget_used[best]), int(max_theme[best]), int(max_country[best])
 
-        if (max_theme <= theme_cap) and (max_country <= country_cap):
-            if (best_solution is None) or (obj_tuple > best_solution[0]):
-                best_solution = (obj_tuple, sel_ids, k, budget_used, max_theme, max_country)
 
+@profiled()
+def select_projects_dp(
+    filepath: str,
+    max_budget: int,
+    theme_diversity_factor: float,
+    country_diversity_factor: float,
+    max_states: int = 200_000,
+    verbose: bool = False,
+    df: pd.DataFrame = None
+) -> List[int]:
+    """Select projects from filepath, or from df when it is already loaded."""
+    if df is None:
+        df = load_frame(filepath)
+    prepared = prepare_items(df)
+
+    best_solution = solve_prepared(prepared, max_budget, theme_diversity_factor, country_diversity_factor,
+                                   max_states)
+    if best_solution is None:
         return []
 
-    obj, sel_ids, k, total_budget_used, max_theme, max_country = best_solution
-    print(f"Selected {k} projects, total_budget={total_budget_used}, max_theme={max_theme}, max_country={max_country}")
-    return list(sel_ids)
-
-
-def plot_participation_timeline(data_path, selected_ids):
-    plt.rcParams['font.family'] = 'serif'
-    plt.rcParams['font.serif'] = ['Times New Roman']
+    positions, total_budget_used, max_theme, max_country = best_solution
+    if verbose:
+        print(f"Selected {len(positions)} projects, total_budget={total_budget_used}, "
+              f"max_theme={max_theme}, max_country={max_country}")
+    return list(prepared['ids'][positions])
 
-    df = pd.read_excel(data_path)
 
-    df_selected = df[df['ID'].isin(selected_ids)].copy()
+def project_spans(df, ids):
+    """Projects in ids with their debut and end date, latest debut first."""
+    df_selected = df[df['ID'].isin(ids)].copy()
     df_selected['debut'] = pd.to_datetime(df_selected['debut'])
     df_selected['end_date'] = df_selected['debut'] + pd.to_timedelta(df_selected['duration'], unit='D')
+    return df_selected.sort_values('debut', ascending=False).reset_index(drop=True)
+
 
-    start_date = df_selected['debut'].min()
-    end_date = df_selected['end_date'].max()
+def timeline_points(spans, freq=TIMELINE_FREQ):
+    """Time points from the first debut to the last end date, or the following April 30 if later."""
+    start_date = spans['debut'].min()
+    end_date = spans['end_date'].max()
 
     april_extension = pd.Timestamp(year=end_date.year if end_date.month <= 4 else end_date.year + 1,
                                    month=4, day=30)
     end_date = max(end_date, april_extension)
 
-    time_points = pd.date_range(start=start_date, end=end_date, freq='D')
-    participation_matrix = np.zeros((len(time_points), len(df_selected)))
-    df_selected = df_selected.sort_values('debut', ascending=False).reset_index(drop=True)
-    for idx, (_, project) in enumerate(df_selected.iterrows()):
-        project_start = project['debut']
-        project_end = project['end_date']
-        project_participants = project['participants']
-
-        for t_idx, t in enumerate(time_points):
-            if t < project_start:
-                participation_matrix[t_idx, idx] = 0
-            elif t <= project_end:
-                days_elapsed = (t - project_start).days
-                total_days = (project_end - project_start).days
-                if total_days > 0:
-                    participation_matrix[t_idx, idx] = project_participants * (days_elapsed / total_days)
-                else:
-                    participation_matrix[t_idx, idx] = project_participants
-            else:
-                participation_matrix[t_idx, idx] = project_participants
+    return pd.date_range(start=start_date, end=end_date, freq=freq)
+
+
+def cumulative_participation(spans, time_points, out=None, block_rows=TIMELINE_BLOCK_ROWS):
+    """
+    (len(time_points), len(spans)) array whose column j is the combined
+    participation of projects 0..j. Each project ramps linearly from 0 at
+    its debut to its participants at its end date.
+
+    The matrix is filled block_rows time points at a time and accumulated in
+    place, so the only temporaries are block-sized. out may be a preallocated
+    array or np.memmap to fill instead of a new array.
+    """
+    if out is None:
+        out = np.empty((len(time_points), len(spans)))
+    day = np.timedelta64(1, 'D')
+    debut = spans['debut'].to_numpy(dtype='datetime64[ns]')
+    total_days = ((spans['end_date'] - spans['debut']) // pd.Timedelta(days=1)).to_numpy(dtype=float)
+    participants = spans['participants'].to_numpy(dtype=float)
+    ramped = total_days > 0
+    total_days = np.where(ramped, total_days, 1.0)
+
+    times = time_points.to_numpy(dtype='datetime64[ns]')
+    for lo in range(0, len(times), block_rows):
+        block = out[lo:lo + block_rows]
+        elapsed = (times[lo:lo + block_rows, None] - debut) // day
+        share = np.where(ramped, np.clip(elapsed / total_days, 0, 1), elapsed >= 0)
+        np.multiply(participants, share, out=block)
+        np.cumsum(block, axis=1, out=block)
+    return out
+
+
+def portfolio_totals(df, portfolios, freq=TIMELINE_FREQ, block_rows=TIMELINE_BLOCK_ROWS):
+    """
+    Total participation over time of several portfolios (name -> IDs) on
+    one shared time axis, one column per portfolio. Portfolios are
+    accumulated one block of time points at a time, keeping only their
+    totals.
+    """
+    spans = {name: project_spans(df, ids) for name, ids in portfolios.items()}
+    time_points = timeline_points(pd.concat(spans.values(), ignore_index=True), freq)
+
+    totals = pd.DataFrame(0.0, index=time_points, columns=list(spans))
+    for name, portfolio in spans.items():
+        if portfolio.empty:
+            continue
+        for lo in range(0, len(time_points), block_rows):
+            block = cumulative_participation(portfolio, time_points[lo:lo + block_rows], block_rows=block_rows)
+            totals.iloc[lo:lo + block_rows, totals.columns.get_loc(name)] = block[:, -1]
+    return totals
+
+
+def plot_participation_timeline(data_path, selected_ids, df=None, freq=TIMELINE_FREQ, backing=None):
+    """
+    Cumulative participation of the selected projects. freq sets the spacing
+    of time points ('W' or 'MS' for long horizons); backing, if given, is a
+    .npy path to hold the matrix as a memory map instead of in RAM.
+    """
+    plt.rcParams['font.family'] = 'serif'
+    plt.rcParams['font.serif'] = ['Times New Roman']
+
+    if df is None:
+        df = load_frame(data_path)
+
+    df_selected = project_spans(df, selected_ids)
+    time_points = timeline_points(df_selected, freq)
+
+    out = None
+    if backing is not None:
+        out = np.lib.format.open_memmap(backing, mode='w+', dtype=float,
+                                        shape=(len(time_points), len(df_selected)))
+    cumulative = cumulative_participation(df_selected, time_points, out)
 
     fig, ax = plt.subplots(figsize=(10, 6), dpi=120)
     line_color = '#2C3E50'
 
-    cumulative_participation = np.cumsum(participation_matrix, axis=1)
-
     for idx in range(len(df_selected)):
-        ax.plot(time_points, cumulative_participation[:, idx],
+        ax.plot(time_points, cumulative[:, idx],
                 color=line_color, linewidth=1.5, alpha=0.7)
 
     ax.set_xlabel('Date', fontsize=12)
@@ -185,26 +310,78 @@ def overlap_coefficient(list1, list2):
     intersection = len(set1 & set2)
     return intersection / min(len(set1), len(set2)) if min(len(set1), len(set2)) > 0 else 0
 
+
+def portfolio_bits(portfolios, ids=None):
+    """
+    Portfolios (a list of ID lists) as bit-packed membership rows over ids,
+    all IDs appearing in them by default. Returns (packed, ids) with packed
+    a (len(portfolios), ceil(len(ids) / 8)) uint8 array.
+    """
+    members = [pd.unique(pd.Series(list(p), dtype=object)) for p in portfolios]
+    flat = np.concatenate(members) if members else np.empty(0, dtype=object)
+    ids = pd.Index(pd.unique(flat) if ids is None else ids)
+    cols = ids.get_indexer(flat)
+    if (cols < 0).any():
+        raise ValueError(f"portfolio ID not in ids: {flat[np.flatnonzero(cols < 0)[0]]!r}")
+    rows = np.repeat(np.arange(len(members)), [len(m) for m in members])
+
+    membership = np.zeros((len(members), len(ids)), dtype=bool)
+    membership[rows, cols] = True
+    return np.packbits(membership, axis=1), ids
+
+
+def pairwise_intersections(packed, block_bytes=OVERLAP_BLOCK_BYTES):
+    """
+    (P, P) number of IDs shared by every pair of bit-packed portfolios. The
+    bits are unpacked block_bytes columns at a time and counted with one
+    matrix product per block.
+    """
+    counts = np.zeros((len(packed), len(packed)), dtype=np.int64)
+    for lo in range(0, packed.shape[1], block_bytes):
+        block = np.unpackbits(packed[:, lo:lo + block_bytes], axis=1).astype(np.float32)
+        counts += np.rint(block @ block.T).astype(np.int64)
+    return counts
+
+
+def portfolio_overlaps(portfolios, ids=None):
+    """
+    Overlap coefficient (as in overlap_coefficient) and Jaccard index of
+    every pair of portfolios, given as a dict of name -> IDs or a list, as
+    two (P, P) DataFrames. Pairs involving an empty portfolio score 0.
+    """
+    names = list(portfolios) if isinstance(portfolios, dict) else list(range(len(portfolios)))
+    packed, _ = portfolio_bits(list(portfolios.values()) if isinstance(portfolios, dict) else portfolios, ids)
+
+    shared = pairwise_intersections(packed)
+    sizes = np.diag(shared)
+    smaller = np.minimum.outer(sizes, sizes)
+    union = np.add.outer(sizes, sizes) - shared
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overlap = np.where(smaller > 0, shared / smaller, 0.0)
+        jaccard = np.where(union > 0, shared / union, 0.0)
+    return (pd.DataFrame(overlap, index=names, columns=names),
+            pd.DataFrame(jaccard, index=names, columns=names))
+
 if __name__ == "__main__":
-    path = "../data/artemis/artemis_data_for_DP.xlsx"
-    max_budget = 9700
-    theme_diversity_factor = 0.8
-    country_diversity_factor = 0.95
-    incoming = [1, 2, 3, 4, 11, 13, 22, 24, 29, 32, 36]
+    path = DATA_PATH
+    incoming = INCOMING_IDS
 
-    selected = select_projects_dp(path, max_budget, theme_diversity_factor, country_diversity_factor,
+    selected = select_projects_dp(path, MAX_BUDGET, THEME_DIVERSITY_FACTOR, COUNTRY_DIVERSITY_FACTOR,
                                   max_states=200_000, verbose=True)
     print("Selected IDs:", selected)
 
-    print("Overlap percentage:" + overlap_coefficient(incoming, selected))
+    print(f"Overlap percentage: {overlap_coefficient(incoming, selected):.1%}")
+
+    totals = portfolio_totals(load_frame(path), {'selected': selected, 'incoming': incoming})
+    print("Total participation:", totals.iloc[-1].round(1).to_dict())
 
     fig, ax = plot_participation_timeline(
-        data_path="../data/artemis/artemis_data_for_DP.xlsx",
+        data_path=DATA_PATH,
         selected_ids=selected
     )
 
     fig, ax = plot_participation_timeline(
-        data_path="../data/artemis/artemis_data_for_DP.xlsx",
+        data_path=DATA_PATH,
         selected_ids=incoming
     )
 
@@ -3,6 +3,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
 
+from intermediate_store import load_frame
+
 rcParams['font.family'] = 'serif'
 rcParams['font.serif'] = ['Times New Roman', 'DejaVu Serif']
 rcParams['font.size'] = 10
@@ -10,79 +12,191 @@ rcParams['axes.linewidth'] = 0.8
 rcParams['grid.linewidth'] = 0.5
 rcParams['lines.linewidth'] = 1.5
 
-df = pd.read_excel('../data/artemis/artemis_data_for_regression.xlsx')
-num_df = df.select_dtypes(include=[np.number])
-corr = num_df.corr().abs()
-
-fig1, ax1 = plt.subplots(figsize=(8, 7), dpi=120)
-im = ax1.imshow(corr, cmap='RdYlBu_r', interpolation='nearest', vmin=0, vmax=1)
-
-ax1.set_xticks(range(len(corr.columns)))
-ax1.set_yticks(range(len(corr.columns)))
-ax1.set_xticklabels(corr.columns, rotation=45, ha='right')
-ax1.set_yticklabels(corr.columns)
-
-for i in range(corr.shape[0]):
-    for j in range(corr.shape[1]):
-        color = 'white' if corr.iloc[i, j] > 0.5 else 'black'
-        ax1.text(j, i, f"{corr.iloc[i, j]:.2f}",
-                 ha='center', va='center', color=color, fontsize=8)
-
-cbar = plt.colorbar(im, ax=ax1, fraction=0.046, pad=0.04)
-cbar.set_label('|Correlation Coefficient|', rotation=270, labelpad=20)
-
-ax1.set_title("Correlation Matrix of Regression Variables",
-              fontsize=12, fontweight='bold', pad=15)
-fig1.tight_layout()
-
-df = pd.read_excel('../data/artemis/artemis_data_for_regression.xlsx')
-
-y = df["Rating"]
-X_vars = {
-    "Budget": df["Budget"],
-    "Target Audience": df["Target Audience"],
-    "Staff": df["Staff"],
-    "Duration": df["Duration"]
-}
-
-degree = 2
-
-fig2, axes = plt.subplots(2, 2, figsize=(10, 8), dpi=120)
-axes = axes.flatten()
-
-for ax, (name, x) in zip(axes, X_vars.items()):
-    mask = ~(x.isna() | y.isna())
-    x_clean = x[mask]
-    y_clean = y[mask]
-
-    coef = np.polyfit(x_clean, y_clean, degree)
-    poly = np.poly1d(coef)
-
-    y_pred = poly(x_clean)
-    ss_res = np.sum((y_clean - y_pred) ** 2)
-    ss_tot = np.sum((y_clean - np.mean(y_clean)) ** 2)
-    r_squared = 1 - (ss_res / ss_tot)
-
-    xs = np.linspace(x_clean.min(), x_clean.max(), 300)
-
-    ax.scatter(x_clean, y_clean, alpha=0.6, s=30,
-               edgecolors='black', linewidths=0.5, color='#2E86AB')
-
-    ax.plot(xs, poly(xs), color='#A23B72', linewidth=2,
-            label=f'$R^2 = {r_squared:.3f}$')
-
-    ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
-
-    ax.set_xlabel(name, fontsize=10, fontweight='bold')
-    ax.set_ylabel("Rating", fontsize=10, fontweight='bold')
-    ax.set_title(f"({chr(97 + list(X_vars.keys()).index(name))}) Rating vs. {name}",
-                 fontsize=10, fontweight='bold', loc='left')
-    ax.legend(loc='best', frameon=True, fontsize=8)
-
-    ax.set_xlim(x_clean.min() - 0.05 * (x_clean.max() - x_clean.min()),
-                x_clean.max() + 0.05 * (x_clean.max() - x_clean.min()))
-
-fig2.suptitle("Polynomial Regression Analysis (Degree 2)",
-              fontsize=12, fontweight='bold', y=0.995)
-fig2.tight_layout()
-plt.show()
\ No newline at end of file
+DATA_PATH = '../data/artemis/artemis_data_for_regression.xlsx'
+ANNOTATE_MAX_FEATURES = 20
+ANNOTATE_THRESHOLD = 0.5
+LABEL_MAX_FEATURES = 40
+PREDICTORS = ["Budget", "Target Audience", "Staff", "Duration"]
+DEGREE = 2
+CURVE_POINTS = 300
+
+
+def cluster_order(values):
+    """Leaf order of an average-linkage clustering on 1 - |corr|."""
+    try:
+        from scipy.cluster.hierarchy import linkage, leaves_list
+        from scipy.spatial.distance import squareform
+    except ImportError:
+        return np.arange(len(values))
+    distance = 1 - np.nan_to_num(values, nan=0.0)
+    np.fill_diagonal(distance, 0)
+    return leaves_list(linkage(squareform(distance, checks=False), method='average'))
+
+
+def plot_correlation(df, cluster=None):
+    """
+    |Correlation| heatmap of the numeric columns.
+
+    Up to ANNOTATE_MAX_FEATURES variables every cell is labelled; beyond that
+    only off-diagonal cells at or above ANNOTATE_THRESHOLD are, up to
+    LABEL_MAX_FEATURES, after which the colours are left to speak. Wide
+    matrices are also reordered by clustering (unless cluster=False) so
+    related variables sit together.
+    """
+    num_df = df.select_dtypes(include=[np.number])
+    corr = num_df.corr().abs()
+    values = corr.to_numpy()
+    labels = np.asarray(corr.columns)
+    n = len(labels)
+
+    if cluster is None:
+        cluster = n > ANNOTATE_MAX_FEATURES
+    if cluster and n > 2:
+        order = cluster_order(values)
+        values = values[np.ix_(order, order)]
+        labels = labels[order]
+
+    fig1, ax1 = plt.subplots(figsize=(8, 7), dpi=120)
+    im = ax1.imshow(values, cmap='RdYlBu_r', interpolation='nearest', vmin=0, vmax=1)
+
+    tick_size = None if n <= ANNOTATE_MAX_FEATURES else max(4, 200 / n)
+    ax1.set_xticks(range(n))
+    ax1.set_yticks(range(n))
+    ax1.set_xticklabels(labels, rotation=45, ha='right', fontsize=tick_size)
+    ax1.set_yticklabels(labels, fontsize=tick_size)
+
+    if n <= ANNOTATE_MAX_FEATURES:
+        # NaN cells (constant columns) are labelled too, as 'nan'.
+        annotate = np.ones_like(values, dtype=bool)
+        font_size = 8
+    elif n <= LABEL_MAX_FEATURES:
+        annotate = (values >= ANNOTATE_THRESHOLD) & ~np.eye(n, dtype=bool)
+        font_size = 160 / n
+    else:
+        annotate = np.zeros_like(values, dtype=bool)
+        font_size = None
+    text = np.char.mod('%.2f', values)
+    colors = np.where(values > 0.5, 'white', 'black')
+    for i, j in zip(*np.nonzero(annotate)):
+        ax1.text(j, i, text[i, j], ha='center', va='center', color=colors[i, j], fontsize=font_size)
+
+    cbar = plt.colorbar(im, ax=ax1, fraction=0.046, pad=0.04)
+    cbar.set_label('|Correlation Coefficient|', rotation=270, labelpad=20)
+
+    ax1.set_title("Correlation Matrix of Regression Variables",
+                  fontsize=12, fontweight='bold', pad=15)
+    fig1.tight_layout()
+    return fig1
+
+
+def _vander(t, max_degree):
+    """Ascending powers 0..max_degree of t along a new last axis."""
+    powers = np.empty(t.shape + (max_degree + 1,))
+    powers[..., 0] = 1.0
+    powers[..., 1:] = t[..., None]
+    return np.cumprod(powers, axis=-1)
+
+
+def fit_polynomials(df, predictors=PREDICTORS, target="Rating", degrees=(DEGREE,), n_points=CURVE_POINTS):
+    """
+    Least-squares polynomial fits of target on every predictor and degree at once.
+
+    Each predictor is rescaled to [-1, 1] and its Vandermonde matrix built
+    once, up to the highest degree, with rows missing x or y zeroed. The
+    normal equations of a lower degree are the leading block of that Gram
+    matrix, so all (predictor, degree) systems are equilibrated and solved in
+    one stacked call. Coefficients are in ascending powers of the rescaled x,
+    (x - center) / scale. Returns a dict of arrays indexed
+    [predictor, degree, ...].
+    """
+    degrees = np.asarray(degrees)
+    powers = np.arange(degrees.max() + 1)
+    used = powers <= degrees[:, None]                                   # (D, K)
+
+    x = df[list(predictors)].to_numpy(dtype=float).T                    # (P, n)
+    y = df[target].to_numpy(dtype=float)
+    mask = np.isfinite(x) & np.isfinite(y)
+    y = np.where(mask, y, 0.0)
+
+    x_min = np.where(mask, x, np.inf).min(axis=1)
+    x_max = np.where(mask, x, -np.inf).max(axis=1)
+    center = (x_max + x_min) / 2
+    scale = (x_max - x_min) / 2
+    scale[~(scale > 0)] = 1.0
+
+    t = np.where(mask, (x - center[:, None]) / scale[:, None], 0.0)
+    vander = _vander(t, degrees.max()) * mask[:, :, None]               # (P, n, K)
+    gram = vander.transpose(0, 2, 1) @ vander                           # (P, K, K)
+    moments = np.einsum('pnk,pn->pk', vander, y)                        # (P, K)
+
+    block = used[:, :, None] & used[:, None, :]                         # (D, K, K)
+    system = np.where(block, gram[:, None], np.eye(len(powers)))        # (P, D, K, K)
+    rhs = np.where(used, moments[:, None], 0.0)                         # (P, D, K)
+    norms = np.sqrt(np.diagonal(system, axis1=2, axis2=3))
+    norms[~(norms > 0)] = 1.0
+    system = system / norms[..., :, None] / norms[..., None, :]
+    coef = np.linalg.solve(system, (rhs / norms)[..., None])[..., 0] / norms
+
+    fitted = np.einsum('pnk,pdk->pdn', vander, coef)                    # (P, D, n)
+    ss_res = ((y[:, None] - fitted) ** 2 * mask[:, None]).sum(axis=2)
+    y_mean = y.sum(axis=1) / mask.sum(axis=1)
+    ss_tot = (((y - y_mean[:, None]) ** 2) * mask).sum(axis=1)
+    r_squared = 1 - ss_res / ss_tot[:, None]
+
+    xs = x_min[:, None] + (x_max - x_min)[:, None] * np.linspace(0, 1, n_points)
+    curves = np.einsum('pdk,pmk->pdm', coef, _vander((xs - center[:, None]) / scale[:, None], degrees.max()))
+
+    return {
+        'predictors': list(predictors), 'degrees': degrees, 'mask': mask,
+        'coef': coef, 'center': center, 'scale': scale,
+        'r_squared': r_squared, 'xs': xs, 'curves': curves,
+    }
+
+
+def plot_polynomial_regression(df, predictors=PREDICTORS, degrees=(DEGREE,)):
+    fits = fit_polynomials(df, predictors, degrees=degrees)
+    y = df["Rating"].to_numpy(dtype=float)
+
+    n_rows = -(-len(predictors) // 2)
+    fig2, axes = plt.subplots(n_rows, 2, figsize=(10, 4 * n_rows), dpi=120, squeeze=False)
+    axes = axes.flatten()
+    for ax in axes[len(predictors):]:
+        ax.set_visible(False)
+
+    for p, (ax, name) in enumerate(zip(axes, predictors)):
+        mask = fits['mask'][p]
+        x_clean = df[name].to_numpy(dtype=float)[mask]
+        y_clean = y[mask]
+
+        ax.scatter(x_clean, y_clean, alpha=0.6, s=30,
+                   edgecolors='black', linewidths=0.5, color='#2E86AB')
+
+        for d, degree in enumerate(fits['degrees']):
+            r_squared = fits['r_squared'][p, d]
+            label = f'$R^2 = {r_squared:.3f}$' if len(degrees) == 1 else f'Degree {degree}: $R^2 = {r_squared:.3f}$'
+            ax.plot(fits['xs'][p], fits['curves'][p, d], linewidth=2, label=label,
+                    color='#A23B72' if len(degrees) == 1 else None)
+
+        ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
+
+        ax.set_xlabel(name, fontsize=10, fontweight='bold')
+        ax.set_ylabel("Rating", fontsize=10, fontweight='bold')
+        ax.set_title(f"({chr(97 + p)}) Rating vs. {name}",
+                     fontsize=10, fontweight='bold', loc='left')
+        ax.legend(loc='best', frameon=True, fontsize=8)
+
+        ax.set_xlim(x_clean.min() - 0.05 * (x_clean.max() - x_clean.min()),
+                    x_clean.max() + 0.05 * (x_clean.max() - x_clean.min()))
+
+    degree_label = ", ".join(str(d) for d in degrees)
+    fig2.suptitle(f"Polynomial Regression Analysis (Degree{'s' if len(degrees) > 1 else ''} {degree_label})",
+                  fontsize=12, fontweight='bold', y=0.995)
+    fig2.tight_layout()
+    return fig2
+
+
+if __name__ == "__main__":
+    df = load_frame(DATA_PATH)
+    plot_correlation(df)
+    plot_polynomial_regression(df)
+    plt.show()
@@ -0,0 +1,256 @@
+"""
+Columnar store for data handed between pipeline stages.
+
+Stages address their artifacts by the workbook path they have always used
+(e.g. ../data/artemis/artemis_data_numeric.xlsx). The frame itself is kept as
+Parquet under ../data/intermediate/. The final, user-facing workbooks
+(merger.py's and merger_simple.py's interval analyses) are always written;
+the .xlsx copies of intermediate artifacts only when ARTEMIS_EXPORT_XLSX=1.
+
+Frames too large to hold at once can be read with iter_frame() and written
+with save_frame_chunks(), a bounded number of rows at a time.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from profiling import profiled, section
+
+try:
+    import pyarrow  # noqa: F401
+    STORE_FORMAT = "parquet"
+except ImportError:
+    STORE_FORMAT = "pickle"
+
+CHUNK_ROWS = 100_000
+STORE_DIR = Path(os.environ.get("ARTEMIS_STORE_DIR", "../data/intermediate"))
+EXPORT_XLSX = os.environ.get("ARTEMIS_EXPORT_XLSX", "0") == "1"
+
+
+def store_path(xlsx_path):
+    """
+    Location of the stored frame for a stage artifact. The name carries a
+    hash of the workbook's directory, so artifacts sharing a file name in
+    different data directories do not collide.
+    """
+    xlsx_path = Path(xlsx_path)
+    directory = hashlib.sha1(str(xlsx_path.resolve().parent).encode()).hexdigest()[:8]
+    suffix = ".parquet" if STORE_FORMAT == "parquet" else ".pkl"
+    return STORE_DIR / f"{xlsx_path.stem}.{directory}{suffix}"
+
+
+def _is_current(stored, xlsx_path):
+    if not stored.exists():
+        return False
+    xlsx_path = Path(xlsx_path)
+    if not xlsx_path.exists():
+        return True
+    return stored.stat().st_mtime >= xlsx_path.stat().st_mtime
+
+
+def source_path(xlsx_path):
+    """
+    The file load_frame reads for an artifact: the stored copy while it is
+    current, otherwise the workbook (None if neither exists).
+    """
+    stored = store_path(xlsx_path)
+    if _is_current(stored, xlsx_path):
+        return stored
+    return Path(xlsx_path) if Path(xlsx_path).exists() else None
+
+
+def temp_path(path):
+    """
+    A fresh temporary file next to path, to be os.replace()d onto it.
+    Unique per writer, so stages refreshing the same file in parallel do not
+    overwrite each other's partial output.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False) as f:
+        return Path(f.name)
+
+
+def _write_store(df, path):
+    tmp = temp_path(path)
+    try:
+        if STORE_FORMAT == "parquet":
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+@profiled()
+def load_frame(xlsx_path, **read_excel_kwargs):
+    """
+    Load a stage artifact, preferring the stored columnar copy.
+
+    Falls back to the workbook when there is no stored copy or the workbook
+    was edited more recently, and refreshes the store from it.
+    """
+    stored = store_path(xlsx_path)
+    if not read_excel_kwargs and _is_current(stored, xlsx_path):
+        if STORE_FORMAT == "parquet":
+            return pd.read_parquet(stored)
+        return pd.read_pickle(stored)
+
+    with section("excel.read"):
+        df = pd.read_excel(xlsx_path, **read_excel_kwargs)
+    if not read_excel_kwargs:
+        _write_store(df, stored)
+    return df
+
+
+def save_frame(df, xlsx_path, export_xlsx=None):
+    """
+    Save a stage artifact to the store.
+
+    The workbook copy is only written when export_xlsx is set, or when
+    ARTEMIS_EXPORT_XLSX=1 for stages that leave it unset.
+    """
+    if export_xlsx is None:
+        export_xlsx = EXPORT_XLSX
+    if export_xlsx:
+        with section("excel.write"):
+            df.to_excel(xlsx_path, index=False)
+    _write_store(df, store_path(xlsx_path))
+    return store_path(xlsx_path)
+
+
+def iter_file(path, chunksize=CHUNK_ROWS, columns=None):
+    """
+    Yield a CSV, Parquet, pickle or Excel file as DataFrames of at most
+    chunksize rows. Parquet is read by row batches and Excel with openpyxl's
+    read-only mode, so only one chunk is in memory at a time (pickles have to
+    be loaded whole). A file without rows yields one empty chunk, so its
+    columns still reach the consumer.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        empty = True
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=columns):
+            empty = False
+            yield chunk
+        if empty:
+            yield pd.read_csv(path, nrows=0, usecols=columns)
+    elif suffix == ".parquet":
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        empty = True
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            empty = False
+            yield batch.to_pandas()
+        if empty:
+            empty_table = parquet.schema_arrow.empty_table()
+            yield (empty_table.select(columns) if columns is not None else empty_table).to_pandas()
+    elif suffix == ".pkl":
+        df = pd.read_pickle(path)
+        df = df[columns] if columns is not None else df
+        for start in range(0, max(len(df), 1), chunksize):
+            yield df.iloc[start:start + chunksize].reset_index(drop=True)
+    else:
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            while header and header[-1] is None:
+                header.pop()
+            width = len(header)
+            header = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            buffer = []
+            chunked = False
+            for row in rows:
+                # read-only rows stop at their last stored cell
+                buffer.append(row[:width] + (None,) * (width - len(row)))
+                if len(buffer) == chunksize:
+                    chunk = pd.DataFrame(buffer, columns=header)
+                    yield chunk[columns] if columns is not None else chunk
+                    buffer = []
+                    chunked = True
+            if buffer or not chunked:
+                chunk = pd.DataFrame(buffer, columns=header)
+                yield chunk[columns] if columns is not None else chunk
+        finally:
+            wb.close()
+
+
+def iter_frame(xlsx_path, chunksize=CHUNK_ROWS, columns=None):
+    """Stream a stage artifact in chunks, preferring the stored copy as load_frame does."""
+    stored = store_path(xlsx_path)
+    return iter_file(stored if _is_current(stored, xlsx_path) else xlsx_path, chunksize, columns)
+
+
+def save_frame_chunks(chunks, xlsx_path, export_xlsx=None, columns=None):
+    """
+    Save a stage artifact arriving as an iterable of DataFrames with the same
+    columns. Parquet is written one row group per chunk; the pickle fallback
+    has to concatenate them. If there are no chunks at all, an empty frame
+    with columns is stored. Returns the store path.
+    """
+    if export_xlsx is None:
+        export_xlsx = EXPORT_XLSX
+    path = store_path(xlsx_path)
+    tmp = temp_path(path)
+    try:
+        _write_chunks(chunks, tmp, xlsx_path if export_xlsx else None, columns)
+        # The workbook is saved last, so the store is touched before it is
+        # moved into place: load_frame only takes a store newer than its workbook.
+        os.utime(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path
+
+
+def _write_chunks(chunks, tmp, xlsx_path, columns):
+    """Write chunks to the store file tmp and, unless xlsx_path is None, to the workbook."""
+    sheet = None
+    if xlsx_path is not None:
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        sheet = wb.create_sheet()
+
+    if STORE_FORMAT == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                    if sheet is not None:
+                        sheet.append(list(chunk.columns))
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+                if sheet is not None:
+                    for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+                        sheet.append(row)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            empty = pd.DataFrame(columns=columns or [])
+            empty.to_parquet(tmp, index=False)
+            if sheet is not None:
+                sheet.append(list(empty.columns))
+    else:
+        chunks = list(chunks)
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns or [])
+        df.to_pickle(tmp)
+        if sheet is not None:
+            sheet.append(list(df.columns))
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+                sheet.append(row)
+
+    if sheet is not None:
+        wb.save(xlsx_path)
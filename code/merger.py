@@ -1,42 +1,121 @@
+import itertools
+import weakref
+from collections import OrderedDict
+
 import pandas as pd
 import numpy as np
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from openpyxl.utils import get_column_letter
+
+from intermediate_store import iter_frame, load_frame, save_frame
+from profiling import count, profiled
+from schema import apply_schema, label_key, label_mask
+from similarity_index import SIMILARITY_COLUMNS, SimilarityIndex
 
 SIMILARITY_THRESHOLD = 0.20
 MIN_MATCHES = 3
 MAX_MATCHES = 15
 FILTER_BY_THEME = True
+SIMILARITY_MODE = 'window'  # 'window': +/-threshold per metric, 'knn': nearest in all three metrics
+KNN_NEIGHBOURS = 10
+EXCEL_MAX_ROWS = 1_048_576
+THEME_VIEW_CACHE_SIZE = 64
+BODY_STYLE = 'artemis body'
+DECIMAL_STYLE = 'artemis decimal'
 RANDOM_SEED = None
 CURRENT_FILE = "../data/artemis/artemis_data_numeric.xlsx"
 PAST_FILE = "../data/comparison_data/previous_projects_data_cleaned.xlsx"
 OUTPUT_FILE = "../data/interval_data/interval_analysis.xlsx"
 
+def _coerce_metrics(df):
+    df.columns = df.columns.str.lower().str.strip()
+    for col in ['participants', 'budget', 'duration']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return apply_schema(df)
+
+
 def load_data():
-    current = pd.read_excel(CURRENT_FILE)
-    past = pd.read_excel(PAST_FILE)
+    return load_current(), load_past()
 
-    current.columns = current.columns.str.lower().str.strip()
-    past.columns = past.columns.str.lower().str.strip()
 
-    for col in ['participants', 'budget', 'duration']:
-        current[col] = pd.to_numeric(current[col], errors='coerce')
-        past[col] = pd.to_numeric(past[col], errors='coerce')
+def load_current(current_file=CURRENT_FILE):
+    return _coerce_metrics(load_frame(current_file))
+
+
+def load_past(past_file=PAST_FILE):
+    return _coerce_metrics(load_frame(past_file))
+
+
+def iter_past(past_file=PAST_FILE):
+    """The past archive as coerced chunks, for passes that do not need it whole."""
+    return (_coerce_metrics(chunk) for chunk in iter_frame(past_file))
+
+
+def load_past_index(past_file=PAST_FILE):
+    """SimilarityIndex over the past archive, read chunk by chunk."""
+    chunks = iter_frame(past_file, columns=SIMILARITY_COLUMNS + ['theme'])
+    return SimilarityIndex.from_chunks(chunks, filter_by_theme=FILTER_BY_THEME)
+
+
+_theme_views = OrderedDict()
+
+
+def _forget_theme_views(frame_id):
+    for key in [key for key in _theme_views if key[0] == frame_id]:
+        del _theme_views[key]
+
+
+def invalidate_theme_views(past_df=None):
+    """
+    Forget cached theme views of past_df (of every frame if None). Every
+    create_detailed_results pass starts with this, so views never outlive
+    the pass they were built for, even if the frame is modified in place
+    between passes; a frame that is garbage collected is forgotten
+    automatically.
+    """
+    if past_df is None:
+        _theme_views.clear()
+    else:
+        _forget_theme_views(id(past_df))
+
+
+def theme_view(past_df, theme):
+    """
+    Past projects sharing theme, or all of them if none do, as
+    (view, fell_back). Views are kept in an LRU cache of
+    THEME_VIEW_CACHE_SIZE entries keyed by frame and normalized theme, so
+    every project of a theme reuses one filtered frame. Callers must not
+    modify the view.
+    """
+    key = (id(past_df), label_key(theme))
+    if key in _theme_views:
+        _theme_views.move_to_end(key)
+    else:
+        if not any(k[0] == key[0] for k in _theme_views):
+            weakref.finalize(past_df, _forget_theme_views, key[0])
+        view = past_df[label_mask(past_df['theme'], theme)]
+        # A fallback is stored as None so the cache holds no reference to past_df.
+        _theme_views[key] = view if len(view) else None
+        if len(_theme_views) > THEME_VIEW_CACHE_SIZE:
+            _theme_views.popitem(last=False)
 
-    return current, past
+    view = _theme_views[key]
+    return (past_df, True) if view is None else (view, False)
 
 
+@profiled()
 def find_similar_projects(current_value, past_df, column, theme=None,
                           threshold=SIMILARITY_THRESHOLD,
                           min_matches=MIN_MATCHES, max_matches=MAX_MATCHES):
     if FILTER_BY_THEME and theme is not None:
-        past_df_filtered = past_df[past_df['theme'].str.strip().str.lower() == theme.strip().lower()].copy()
-        if len(past_df_filtered) == 0:
+        past_df_filtered, fell_back = theme_view(past_df, theme)
+        if fell_back:
+            count("find_similar_projects.theme_fallback")
             print(f"  Warning: No past projects with theme '{theme}', using all projects")
-            past_df_filtered = past_df.copy()
     else:
-        past_df_filtered = past_df.copy()
+        past_df_filtered = past_df
 
     lower = current_value * (1 - threshold)
     upper = current_value * (1 + threshold)
@@ -48,6 +127,7 @@ def find_similar_projects(current_value, past_df, column, theme=None,
     similar = similar.sort_values('_distance')
 
     if len(similar) < min_matches:
+        count("find_similar_projects.nearest_fallback")
         past_df_temp = past_df_filtered.copy()
         past_df_temp['_distance'] = abs(past_df_temp[column] - current_value)
         past_df_temp = past_df_temp.sort_values('_distance')
@@ -61,36 +141,86 @@ def find_similar_projects(current_value, past_df, column, theme=None,
     return similar
 
 
-def calculate_spread(current_row, similar_projects, metrics):
-    spreads = {}
+SPREAD_STATS = ['min_ratio', 'max_ratio', 'mean_ratio', 'std_ratio', 'median_ratio', 'p10', 'p90']
+
+ANALYSES = [
+    ('part', 'participants', ['budget', 'duration']),
+    ('budget', 'budget', ['participants', 'duration']),
+    ('duration', 'duration', ['participants', 'budget']),
+]
+METRIC_LABELS = {'participants': 'part', 'budget': 'budget', 'duration': 'duration'}
+DETAIL_STATS = ['min_ratio', 'max_ratio', 'mean_ratio', 'p10', 'p90']
+
+
+def _percentile_sorted(sorted_values, starts, counts, q):
+    """Linear-interpolated percentile of each sorted segment (NumPy's default method)."""
+    pos = (counts - 1) * (q / 100)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, counts - 1)
+    frac = pos - lo
+    low_vals = sorted_values[starts + lo]
+    high_vals = sorted_values[starts + hi]
+    return low_vals + (high_vals - low_vals) * frac
+
+
+def spread_statistics(values, offsets):
+    """
+    Spread statistics for many ragged groups at once.
+
+    Group g is values[offsets[g]:offsets[g + 1]]. Returns a dict mapping each
+    name in SPREAD_STATS to an array with one entry per group; empty groups and
+    groups containing NaN get NaN, as the per-array NumPy calls would.
+    """
+    values = np.asarray(values, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    counts = np.diff(offsets)
+    n_groups = len(counts)
+    stats = {name: np.full(n_groups, np.nan) for name in SPREAD_STATS}
+    if n_groups == 0 or len(values) == 0:
+        return stats
+
+    group_ids = np.repeat(np.arange(n_groups), counts)
+    nan_mask = np.isnan(values)
+    has_nan = np.bincount(group_ids, weights=nan_mask, minlength=n_groups) > 0
+    valid = (counts > 0) & ~has_nan
+    if not valid.any():
+        return stats
+
+    clean = np.where(nan_mask, 0.0, values)
+    safe_counts = np.maximum(counts, 1)
+    means = np.bincount(group_ids, weights=clean, minlength=n_groups) / safe_counts
+    deviations = clean - means[group_ids]
+    variances = np.bincount(group_ids, weights=deviations ** 2, minlength=n_groups) / safe_counts
+
+    sorted_values = clean[np.lexsort((clean, group_ids))]
+    starts = offsets[:-1][valid]
+    group_counts = counts[valid]
+
+    stats['min_ratio'][valid] = sorted_values[starts]
+    stats['max_ratio'][valid] = sorted_values[starts + group_counts - 1]
+    stats['mean_ratio'][valid] = means[valid]
+    stats['std_ratio'][valid] = np.sqrt(variances[valid])
+    stats['median_ratio'][valid] = _percentile_sorted(sorted_values, starts, group_counts, 50)
+    stats['p10'][valid] = _percentile_sorted(sorted_values, starts, group_counts, 10)
+    stats['p90'][valid] = _percentile_sorted(sorted_values, starts, group_counts, 90)
+    return stats
+
+
+def _ratios(neighbour_values, current_val):
+    if current_val == 0:
+        return np.empty(0)
+    return neighbour_values / current_val
 
-    for metric in metrics:
-        current_val = current_row[metric]
-        if current_val == 0:
-            spreads[metric] = {
-                'ratios': [],
-                'min_ratio': np.nan,
-                'max_ratio': np.nan,
-                'mean_ratio': np.nan,
-                'std_ratio': np.nan,
-                'median_ratio': np.nan,
-                'p10': np.nan,
-                'p90': np.nan
-            }
-            continue
 
-        ratios = similar_projects[metric].values / current_val
-
-        spreads[metric] = {
-            'ratios': ratios,
-            'min_ratio': np.min(ratios),
-            'max_ratio': np.max(ratios),
-            'mean_ratio': np.mean(ratios),
-            'std_ratio': np.std(ratios),
-            'median_ratio': np.median(ratios),
-            'p10': np.percentile(ratios, 10),
-            'p90': np.percentile(ratios, 90)
-        }
+def calculate_spread(current_row, similar_projects, metrics):
+    ratios = [_ratios(similar_projects[metric].values, current_row[metric]) for metric in metrics]
+    offsets = np.concatenate([[0], np.cumsum([len(r) for r in ratios])])
+    stats = spread_statistics(np.concatenate(ratios), offsets)
+
+    spreads = {}
+    for g, metric in enumerate(metrics):
+        spreads[metric] = {'ratios': ratios[g]}
+        spreads[metric].update({name: stats[name][g] for name in SPREAD_STATS})
 
     return spreads
 
@@ -129,12 +259,33 @@ def analyze_project(current_row, past_df):
     return results
 
 
-def create_detailed_results(current_df, past_df):
-    all_results = []
+def create_detailed_results(current_df, past_df, find_similar=None, mode=None, index=None):
+    """
+    Generate detailed analysis for all current projects.
+
+    In 'window' mode each analysis searches past projects on its own column;
+    in 'knn' mode all three analyses share the KNN_NEIGHBOURS nearest past
+    projects from a SimilarityIndex (built from past_df unless given).
+    Neighbour ratios of every project, analysis and metric are collected into
+    one flat array and summarised with a single spread_statistics call.
+    """
+    find_similar = find_similar or find_similar_projects
+    mode = mode or SIMILARITY_MODE
+    if mode == 'knn':
+        index = index or SimilarityIndex.from_frame(past_df, filter_by_theme=FILTER_BY_THEME)
+        neighbours = index.query(current_df, KNN_NEIGHBOURS)
+    elif mode != 'window':
+        raise ValueError(f"unknown similarity mode: {mode!r}")
+    else:
+        # past_df may have been modified since an earlier pass cached its views.
+        invalidate_theme_views(past_df)
 
-    for idx, row in current_df.iterrows():
-        analysis = analyze_project(row, past_df)
+    all_results = []
+    chunks = []
+    slots = []
 
+    for i, (idx, row) in enumerate(current_df.iterrows()):
+        theme = row.get('theme', None)
         result = {
             'project_index': idx,
             'country': row.get('country', 'N/A'),
@@ -142,45 +293,33 @@ def create_detailed_results(current_df, past_df):
             'current_participants': row['participants'],
             'current_budget': row['budget'],
             'current_duration': row['duration'],
-
-            'part_similar_count': analysis['participation_analysis']['similar_count'],
-            'part_budget_min_ratio': analysis['participation_analysis']['spreads']['budget']['min_ratio'],
-            'part_budget_max_ratio': analysis['participation_analysis']['spreads']['budget']['max_ratio'],
-            'part_budget_mean_ratio': analysis['participation_analysis']['spreads']['budget']['mean_ratio'],
-            'part_budget_p10': analysis['participation_analysis']['spreads']['budget']['p10'],
-            'part_budget_p90': analysis['participation_analysis']['spreads']['budget']['p90'],
-            'part_duration_min_ratio': analysis['participation_analysis']['spreads']['duration']['min_ratio'],
-            'part_duration_max_ratio': analysis['participation_analysis']['spreads']['duration']['max_ratio'],
-            'part_duration_mean_ratio': analysis['participation_analysis']['spreads']['duration']['mean_ratio'],
-            'part_duration_p10': analysis['participation_analysis']['spreads']['duration']['p10'],
-            'part_duration_p90': analysis['participation_analysis']['spreads']['duration']['p90'],
-
-            'budget_similar_count': analysis['budget_analysis']['similar_count'],
-            'budget_part_min_ratio': analysis['budget_analysis']['spreads']['participants']['min_ratio'],
-            'budget_part_max_ratio': analysis['budget_analysis']['spreads']['participants']['max_ratio'],
-            'budget_part_mean_ratio': analysis['budget_analysis']['spreads']['participants']['mean_ratio'],
-            'budget_part_p10': analysis['budget_analysis']['spreads']['participants']['p10'],
-            'budget_part_p90': analysis['budget_analysis']['spreads']['participants']['p90'],
-            'budget_duration_min_ratio': analysis['budget_analysis']['spreads']['duration']['min_ratio'],
-            'budget_duration_max_ratio': analysis['budget_analysis']['spreads']['duration']['max_ratio'],
-            'budget_duration_mean_ratio': analysis['budget_analysis']['spreads']['duration']['mean_ratio'],
-            'budget_duration_p10': analysis['budget_analysis']['spreads']['duration']['p10'],
-            'budget_duration_p90': analysis['budget_analysis']['spreads']['duration']['p90'],
-
-            'duration_similar_count': analysis['duration_analysis']['similar_count'],
-            'duration_part_min_ratio': analysis['duration_analysis']['spreads']['participants']['min_ratio'],
-            'duration_part_max_ratio': analysis['duration_analysis']['spreads']['participants']['max_ratio'],
-            'duration_part_mean_ratio': analysis['duration_analysis']['spreads']['participants']['mean_ratio'],
-            'duration_part_p10': analysis['duration_analysis']['spreads']['participants']['p10'],
-            'duration_part_p90': analysis['duration_analysis']['spreads']['participants']['p90'],
-            'duration_budget_min_ratio': analysis['duration_analysis']['spreads']['budget']['min_ratio'],
-            'duration_budget_max_ratio': analysis['duration_analysis']['spreads']['budget']['max_ratio'],
-            'duration_budget_mean_ratio': analysis['duration_analysis']['spreads']['budget']['mean_ratio'],
-            'duration_budget_p10': analysis['duration_analysis']['spreads']['budget']['p10'],
-            'duration_budget_p90': analysis['duration_analysis']['spreads']['budget']['p90'],
         }
+
+        for prefix, column, metrics in ANALYSES:
+            if mode == 'knn':
+                similar = index.values[neighbours[i]]
+            else:
+                similar = find_similar(row[column], past_df, column, theme=theme)
+            result[f'{prefix}_similar_count'] = len(similar)
+            for metric in metrics:
+                key = f'{prefix}_{METRIC_LABELS[metric]}'
+                for stat in DETAIL_STATS:
+                    result[f'{key}_{stat}'] = np.nan
+                slots.append((len(all_results), key))
+                if mode == 'knn':
+                    neighbour_values = similar[:, SIMILARITY_COLUMNS.index(metric)]
+                else:
+                    neighbour_values = similar[metric].values
+                chunks.append(_ratios(neighbour_values, row[metric]))
+
         all_results.append(result)
 
+    offsets = np.concatenate([[0], np.cumsum([len(c) for c in chunks])])
+    stats = spread_statistics(np.concatenate(chunks) if chunks else np.empty(0), offsets)
+    for g, (row_idx, key) in enumerate(slots):
+        for stat in DETAIL_STATS:
+            all_results[row_idx][f'{key}_{stat}'] = stats[stat][g]
+
     return pd.DataFrame(all_results)
 
 
@@ -286,10 +425,66 @@ def create_hypothesis_comparison(detailed_df):
     return pd.DataFrame(comparison)
 
 
-def style_excel(ws, df, start_row=1, header_fill='4472C4'):
-    """Apply basic styling to worksheet."""
-    header_font = Font(bold=True, color='FFFFFF')
-    header_fill_style = PatternFill(start_color=header_fill, end_color=header_fill, fill_type='solid')
+def column_widths(df, max_width=40):
+    """Column widths from the longest rendered value, header included."""
+    widths = []
+    for col in df.columns:
+        values = df[col].astype(object)
+        lengths = values.where(values.notna(), '').astype(str).str.len()
+        max_len = max(len(str(col)), int(lengths.max()) if len(lengths) else 0)
+        widths.append(min(max_len + 2, max_width))
+    return widths
+
+
+def read_back_decimals(df):
+    """
+    Per column, whether its cells get the decimal format as if df had been
+    read back from a workbook: read_excel returns a float column whose values
+    are all whole as integers, so only the other float columns are decimal
+    (True / False). None leaves the choice to each value, as for object
+    columns.
+    """
+    flags = []
+    for col, dtype in zip(df.columns, df.dtypes):
+        if not pd.api.types.is_float_dtype(dtype):
+            flags.append(None)
+            continue
+        values = df[col].to_numpy(dtype=float)
+        flags.append(not (np.isfinite(values).all() and (values == np.round(values)).all()))
+    return flags
+
+
+def sheet_layout(chunks):
+    """Column widths and read-back decimal flags of a stream of chunks, in one pass over it."""
+    layouts = [(column_widths(chunk), read_back_decimals(chunk)) for chunk in chunks]
+    widths = [max(col_widths) for col_widths in zip(*(w for w, _ in layouts))]
+    decimals = [None if all(flag is None for flag in flags) else any(flags)
+                for flags in zip(*(d for _, d in layouts))]
+    return widths, decimals
+
+
+@profiled()
+def write_styled_sheet(wb, title, df, header_fill='4472C4', widths=None, decimals=None):
+    """
+    Stream a DataFrame into a write-only workbook as a styled sheet. df may
+    also be an iterable of chunks with the same columns, written one at a
+    time; their widths then have to be given, as the rows are only seen once.
+
+    Float columns get the decimal format, as do float values in object
+    columns; decimals (see read_back_decimals) overrides that per column.
+    """
+    if isinstance(df, pd.DataFrame):
+        first, chunks = df, []
+    else:
+        chunks = iter(df)
+        first = next(chunks, None)
+        if first is None:
+            return wb.create_sheet(title)
+
+    ws = wb.create_sheet(title)
+    for col_idx, width in enumerate(widths or column_widths(first), 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
     thin_border = Border(
         left=Side(style='thin'),
         right=Side(style='thin'),
@@ -297,58 +492,62 @@ def style_excel(ws, df, start_row=1, header_fill='4472C4'):
         bottom=Side(style='thin')
     )
 
-    for col_idx, cell in enumerate(ws[start_row], 1):
-        cell.font = header_font
-        cell.fill = header_fill_style
+    header = []
+    for name in first.columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True, color='FFFFFF')
+        cell.fill = PatternFill(start_color=header_fill, end_color=header_fill, fill_type='solid')
         cell.alignment = Alignment(horizontal='center', wrap_text=True)
         cell.border = thin_border
-
-    for row in ws.iter_rows(min_row=start_row + 1, max_row=ws.max_row, max_col=ws.max_column):
-        for cell in row:
-            cell.border = thin_border
-            if isinstance(cell.value, float):
-                cell.number_format = '0.000'
+        header.append(cell)
+    ws.append(header)
+
+    # Body cells share two named styles, registered once per workbook.
+    for name, number_format in [(BODY_STYLE, 'General'), (DECIMAL_STYLE, '0.000')]:
+        if name not in wb.named_styles:
+            wb.add_named_style(NamedStyle(name=name, border=thin_border, number_format=number_format))
+
+    for chunk in itertools.chain([first], chunks):
+        column_decimals = decimals or [True if pd.api.types.is_float_dtype(dtype) else None
+                                       for dtype in chunk.dtypes]
+        for values in chunk.itertuples(index=False, name=None):
+            row = []
+            for value, decimal in zip(values, column_decimals):
+                if value is pd.NaT:
+                    value = None
+                if decimal is None:
+                    decimal = isinstance(value, float)
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = DECIMAL_STYLE if decimal else BODY_STYLE
+                row.append(cell)
+            ws.append(row)
+
+    return ws
 
 
 def export_to_excel(detailed_df, summary_df, hypothesis_df, current_df, past_df, filename):
-    """Export all results to Excel with multiple sheets."""
-    wb = Workbook()
-
-    ws1 = wb.active
-    ws1.title = "Detailed Analysis"
-    for r_idx, row in enumerate(dataframe_to_rows(detailed_df, index=False, header=True), 1):
-        for c_idx, val in enumerate(row, 1):
-            ws1.cell(row=r_idx, column=c_idx, value=val)
-    style_excel(ws1, detailed_df)
-
-    ws2 = wb.create_sheet("Summary Report")
-    for r_idx, row in enumerate(dataframe_to_rows(summary_df, index=False, header=True), 1):
-        for c_idx, val in enumerate(row, 1):
-            ws2.cell(row=r_idx, column=c_idx, value=val)
-    style_excel(ws2, summary_df, header_fill='548235')
-
-    ws3 = wb.create_sheet("Hypothesis Comparison")
-    for r_idx, row in enumerate(dataframe_to_rows(hypothesis_df, index=False, header=True), 1):
-        for c_idx, val in enumerate(row, 1):
-            ws3.cell(row=r_idx, column=c_idx, value=val)
-    style_excel(ws3, hypothesis_df, header_fill='C65911')
-
-    ws4 = wb.create_sheet("Current Projects")
-    for r_idx, row in enumerate(dataframe_to_rows(current_df, index=False, header=True), 1):
-        for c_idx, val in enumerate(row, 1):
-            ws4.cell(row=r_idx, column=c_idx, value=val)
-    style_excel(ws4, current_df, header_fill='7030A0')
-
-    ws5 = wb.create_sheet("Past Projects")
-    for r_idx, row in enumerate(dataframe_to_rows(past_df, index=False, header=True), 1):
-        for c_idx, val in enumerate(row, 1):
-            ws5.cell(row=r_idx, column=c_idx, value=val)
-    style_excel(ws5, past_df, header_fill='7030A0')
-
-    for ws in [ws1, ws2, ws3, ws4, ws5]:
-        for col in ws.columns:
-            max_len = max(len(str(cell.value or '')) for cell in col)
-            ws.column_dimensions[col[0].column_letter].width = min(max_len + 2, 40)
+    """
+    Export all results to Excel with multiple sheets. past_df may also be a
+    function returning the past projects as chunks, which are then streamed
+    onto their sheet (once to lay out the columns, once to write them).
+
+    The current and past projects were sheets of workbooks read back with
+    read_excel, so they are formatted as such: whole-number float columns
+    show as integers.
+    """
+    wb = Workbook(write_only=True)
+
+    write_styled_sheet(wb, "Detailed Analysis", detailed_df)
+    write_styled_sheet(wb, "Summary Report", summary_df, header_fill='548235')
+    write_styled_sheet(wb, "Hypothesis Comparison", hypothesis_df, header_fill='C65911')
+    write_styled_sheet(wb, "Current Projects", current_df, header_fill='7030A0',
+                       decimals=read_back_decimals(current_df))
+    if callable(past_df):
+        widths, decimals = sheet_layout(past_df())
+        write_styled_sheet(wb, "Past Projects", past_df(), header_fill='7030A0', widths=widths, decimals=decimals)
+    elif past_df is not None:
+        write_styled_sheet(wb, "Past Projects", past_df, header_fill='7030A0',
+                           decimals=read_back_decimals(past_df))
 
     wb.save(filename)
 
@@ -368,17 +567,31 @@ def print_summary_report(summary_df, hypothesis_df):
 
 
 def main():
-    current_df, past_df = load_data()
+    if SIMILARITY_MODE == 'knn':
+        # Only the index is held in memory; the archive is streamed onto the
+        # workbook's past-projects sheet while it fits on one.
+        current_df = load_current()
+        index = load_past_index()
+        past_df = None
+        past_sheet = iter_past if len(index.values) < EXCEL_MAX_ROWS else None
+        n_past = len(index.values)
+    else:
+        current_df, past_df = load_data()
+        index = None
+        past_sheet = past_df
+        n_past = len(past_df)
     print(f"Current projects: {len(current_df)}")
-    print(f"Past projects: {len(past_df)}")
+    print(f"Past projects: {n_past}")
 
-    detailed_df = create_detailed_results(current_df, past_df)
+    detailed_df = create_detailed_results(current_df, past_df, index=index)
 
     summary_df = create_summary_report(detailed_df)
     hypothesis_df = create_hypothesis_comparison(detailed_df)
 
     print_summary_report(summary_df, hypothesis_df)
-    export_to_excel(detailed_df, summary_df, hypothesis_df, current_df, past_df, OUTPUT_FILE)
+    # The store is written after the workbook, so load_frame finds it current.
+    export_to_excel(detailed_df, summary_df, hypothesis_df, current_df, past_sheet, OUTPUT_FILE)
+    save_frame(detailed_df, OUTPUT_FILE, export_xlsx=False)
     return detailed_df, summary_df, hypothesis_df
 
 
@@ -0,0 +1,102 @@
+"""
+Interval analysis of every cohort against all the cohorts before it.
+
+COHORTS lists the cohort files, oldest first. They are loaded once into one
+frame and indexed by a single CohortIndex (one partition per cohort). Every
+project of every later cohort is then matched with its KNN_NEIGHBOURS
+nearest projects from strictly earlier cohorts, all in one
+create_detailed_results pass. The oldest cohort has no history and is only
+used for matching.
+
+Results are saved as one frame with a cohort column. The same frame is also
+written as a Parquet dataset partitioned by cohort, and as a workbook with
+one detail sheet per cohort.
+"""
+
+import os
+import shutil
+
+import pandas as pd
+from openpyxl import Workbook
+
+import merger
+from intermediate_store import STORE_DIR, STORE_FORMAT, load_frame, save_frame
+from schema import apply_schema
+from similarity_index import COHORT_COLUMN, SIMILARITY_COLUMNS, CohortIndex
+
+# (label, file) of every cohort, oldest first.
+COHORTS = [
+    ('archive', merger.PAST_FILE),
+    ('current', merger.CURRENT_FILE),
+]
+COHORT_FIELDS = ['theme', 'country'] + SIMILARITY_COLUMNS
+OUTPUT_FILE = "../data/interval_data/interval_analysis_cohorts.xlsx"
+PARTITIONED_DIR = STORE_DIR / "interval_analysis_cohorts"
+
+
+def load_cohorts(cohorts=COHORTS):
+    """
+    All cohorts as one frame, with an ordered categorical COHORT_COLUMN.
+    Each project keeps its row label in its own cohort file as index.
+    """
+    labels = [label for label, _ in cohorts]
+    frames = []
+    for label, path in cohorts:
+        df = merger._coerce_metrics(load_frame(path))
+        frames.append(df[[col for col in COHORT_FIELDS if col in df.columns]].assign(**{COHORT_COLUMN: label}))
+    combined = pd.concat(frames)
+    combined[COHORT_COLUMN] = pd.Categorical(combined[COHORT_COLUMN], categories=labels, ordered=True)
+    return apply_schema(combined)
+
+
+def analyze_cohorts(combined, index=None):
+    """Detailed results of every project with history, with its cohort as first column."""
+    index = index or CohortIndex.from_frame(combined, filter_by_theme=merger.FILTER_BY_THEME)
+    analysed = combined[combined[COHORT_COLUMN].cat.codes > 0]
+    detailed = merger.create_detailed_results(analysed, None, mode='knn', index=index)
+    detailed.insert(0, COHORT_COLUMN, analysed[COHORT_COLUMN].to_numpy())
+    return detailed
+
+
+def save_partitioned(detailed, directory=PARTITIONED_DIR):
+    """Write detailed results as a Parquet dataset with one directory per cohort."""
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    detailed.to_parquet(tmp, partition_cols=[COHORT_COLUMN], index=False)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return directory
+
+
+def export_to_excel(detailed, summaries, filename):
+    wb = Workbook(write_only=True)
+    for cohort, group in detailed.groupby(COHORT_COLUMN, observed=True, sort=True):
+        merger.write_styled_sheet(wb, f"{cohort} Details"[:31], group.drop(columns=COHORT_COLUMN))
+        merger.write_styled_sheet(wb, f"{cohort} Summary"[:31], summaries[cohort], header_fill='548235')
+    wb.save(filename)
+
+
+def main():
+    combined = load_cohorts()
+    index = CohortIndex.from_frame(combined, filter_by_theme=merger.FILTER_BY_THEME)
+    for cohort, count in combined[COHORT_COLUMN].value_counts(sort=False).items():
+        print(f"Cohort {cohort}: {count} projects, {index.history_size(cohort)} earlier")
+
+    detailed = analyze_cohorts(combined, index)
+
+    summaries = {}
+    for cohort, group in detailed.groupby(COHORT_COLUMN, observed=True, sort=True):
+        summaries[cohort] = merger.create_summary_report(group)
+        print(f"\nCohort {cohort}")
+        merger.print_summary_report(summaries[cohort], merger.create_hypothesis_comparison(group))
+
+    # The store is written after the workbook, so load_frame finds it current.
+    export_to_excel(detailed, summaries, OUTPUT_FILE)
+    save_frame(detailed, OUTPUT_FILE, export_xlsx=False)
+    if STORE_FORMAT == "parquet":
+        save_partitioned(detailed)
+    return detailed
+
+
+if __name__ == "__main__":
+    main()
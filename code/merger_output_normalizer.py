@@ -1,8 +1,10 @@
 import pandas as pd
 import numpy as np
 
-df_advanced = pd.read_excel("../data/interval_data/interval_analysis.xlsx")
-df_simple = pd.read_excel("../data/interval_data/interval_analysis_simple.xlsx")
+from intermediate_store import load_frame, save_frame
+
+df_advanced = load_frame("../data/interval_data/interval_analysis.xlsx")
+df_simple = load_frame("../data/interval_data/interval_analysis_simple.xlsx")
 
 budget_ci_low = df_simple["current_budget"] - df_simple["current_budget"] * np.maximum(df_advanced["budget_part_p10"], df_advanced["budget_duration_p10"])
 budget_ci_high = df_simple["current_budget"] + df_simple["current_budget"] * np.minimum(df_advanced["budget_part_p10"], df_advanced["budget_duration_p10"])
@@ -18,7 +20,7 @@ df_simple["participation_ci_high"] = participation_ci_high
 df_simple["duration_ci_low"] = duration_ci_low
 df_simple["duration_ci_high"] = duration_ci_high
 
-df_simple.to_csv("../data/interval_data/interval_analysis_applied.csv", index=False)
+out_path = save_frame(df_simple, "../data/interval_data/interval_analysis_applied.xlsx")
 
-print("Normalized data saved to 'interval_analysis_applied.xlsx'")
+print(f"Normalized data saved to '{out_path}'")
 print(df_simple.head())
\ No newline at end of file
@@ -4,6 +4,12 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.utils.dataframe import dataframe_to_rows
 
+import merger
+from intermediate_store import load_frame, save_frame
+from profiling import count, profiled
+from merger import calculate_spread, theme_view
+from schema import apply_schema
+
 SIMILARITY_THRESHOLD = 0.20
 MIN_MATCHES = 5
 MAX_MATCHES = 15
@@ -16,8 +22,8 @@ OUTPUT_FILE = "../data/interval_data/interval_analysis_simple.xlsx"
 
 def load_data():
     """Load current and past project data."""
-    current = pd.read_excel(CURRENT_FILE)
-    past = pd.read_excel(PAST_FILE)
+    current = load_frame(CURRENT_FILE)
+    past = load_frame(PAST_FILE)
 
     current.columns = current.columns.str.lower().str.strip()
     past.columns = past.columns.str.lower().str.strip()
@@ -26,19 +32,20 @@ def load_data():
         current[col] = pd.to_numeric(current[col], errors='coerce')
         past[col] = pd.to_numeric(past[col], errors='coerce')
 
-    return current, past
+    return apply_schema(current), apply_schema(past)
 
 
+@profiled()
 def find_similar_projects(current_value, past_df, column, theme=None,
                           threshold=SIMILARITY_THRESHOLD,
                           min_matches=MIN_MATCHES, max_matches=MAX_MATCHES):
     if FILTER_BY_THEME and theme is not None:
-        past_df_filtered = past_df[past_df['theme'].str.strip().str.lower() == theme.strip().lower()].copy()
-        if len(past_df_filtered) == 0:
+        past_df_filtered, fell_back = theme_view(past_df, theme)
+        if fell_back:
+            count("find_similar_projects.theme_fallback")
             print(f"  Warning: No past projects with theme '{theme}', using all projects")
-            past_df_filtered = past_df.copy()
     else:
-        past_df_filtered = past_df.copy()
+        past_df_filtered = past_df
 
     lower = current_value * (1 - threshold)
     upper = current_value * (1 + threshold)
@@ -50,6 +57,7 @@ def find_similar_projects(current_value, past_df, column, theme=None,
     similar = similar.sort_values('_distance')
 
     if len(similar) < min_matches:
+        count("find_similar_projects.nearest_fallback")
         past_df_temp = past_df_filtered.copy()
         past_df_temp['_distance'] = abs(past_df_temp[column] - current_value)
         past_df_temp = past_df_temp.sort_values('_distance')
@@ -63,40 +71,6 @@ def find_similar_projects(current_value, past_df, column, theme=None,
     return similar
 
 
-def calculate_spread(current_row, similar_projects, metrics):
-    spreads = {}
-
-    for metric in metrics:
-        current_val = current_row[metric]
-        if current_val == 0:
-            spreads[metric] = {
-                'ratios': [],
-                'min_ratio': np.nan,
-                'max_ratio': np.nan,
-                'mean_ratio': np.nan,
-                'std_ratio': np.nan,
-                'median_ratio': np.nan,
-                'p10': np.nan,
-                'p90': np.nan
-            }
-            continue
-
-        ratios = similar_projects[metric].values / current_val
-
-        spreads[metric] = {
-            'ratios': ratios,
-            'min_ratio': np.min(ratios),
-            'max_ratio': np.max(ratios),
-            'mean_ratio': np.mean(ratios),
-            'std_ratio': np.std(ratios),
-            'median_ratio': np.median(ratios),
-            'p10': np.percentile(ratios, 10),
-            'p90': np.percentile(ratios, 90)
-        }
-
-    return spreads
-
-
 def analyze_project(current_row, past_df):
     results = {}
     theme = current_row.get('theme', None)
@@ -133,58 +107,7 @@ def analyze_project(current_row, past_df):
 
 def create_detailed_results(current_df, past_df):
     """Generate detailed analysis for all current projects."""
-    all_results = []
-
-    for idx, row in current_df.iterrows():
-        analysis = analyze_project(row, past_df)
-
-        result = {
-            'project_index': idx,
-            'country': row.get('country', 'N/A'),
-            'theme': row.get('theme', 'N/A'),
-            'current_participants': row['participants'],
-            'current_budget': row['budget'],
-            'current_duration': row['duration'],
-
-            'part_similar_count': analysis['participation_analysis']['similar_count'],
-            'part_budget_min_ratio': analysis['participation_analysis']['spreads']['budget']['min_ratio'],
-            'part_budget_max_ratio': analysis['participation_analysis']['spreads']['budget']['max_ratio'],
-            'part_budget_mean_ratio': analysis['participation_analysis']['spreads']['budget']['mean_ratio'],
-            'part_budget_p10': analysis['participation_analysis']['spreads']['budget']['p10'],
-            'part_budget_p90': analysis['participation_analysis']['spreads']['budget']['p90'],
-            'part_duration_min_ratio': analysis['participation_analysis']['spreads']['duration']['min_ratio'],
-            'part_duration_max_ratio': analysis['participation_analysis']['spreads']['duration']['max_ratio'],
-            'part_duration_mean_ratio': analysis['participation_analysis']['spreads']['duration']['mean_ratio'],
-            'part_duration_p10': analysis['participation_analysis']['spreads']['duration']['p10'],
-            'part_duration_p90': analysis['participation_analysis']['spreads']['duration']['p90'],
-
-            'budget_similar_count': analysis['budget_analysis']['similar_count'],
-            'budget_part_min_ratio': analysis['budget_analysis']['spreads']['participants']['min_ratio'],
-            'budget_part_max_ratio': analysis['budget_analysis']['spreads']['participants']['max_ratio'],
-            'budget_part_mean_ratio': analysis['budget_analysis']['spreads']['participants']['mean_ratio'],
-            'budget_part_p10': analysis['budget_analysis']['spreads']['participants']['p10'],
-            'budget_part_p90': analysis['budget_analysis']['spreads']['participants']['p90'],
-            'budget_duration_min_ratio': analysis['budget_analysis']['spreads']['duration']['min_ratio'],
-            'budget_duration_max_ratio': analysis['budget_analysis']['spreads']['duration']['max_ratio'],
-            'budget_duration_mean_ratio': analysis['budget_analysis']['spreads']['duration']['mean_ratio'],
-            'budget_duration_p10': analysis['budget_analysis']['spreads']['duration']['p10'],
-            'budget_duration_p90': analysis['budget_analysis']['spreads']['duration']['p90'],
-
-            'duration_similar_count': analysis['duration_analysis']['similar_count'],
-            'duration_part_min_ratio': analysis['duration_analysis']['spreads']['participants']['min_ratio'],
-            'duration_part_max_ratio': analysis['duration_analysis']['spreads']['participants']['max_ratio'],
-            'duration_part_mean_ratio': analysis['duration_analysis']['spreads']['participants']['mean_ratio'],
-            'duration_part_p10': analysis['duration_analysis']['spreads']['participants']['p10'],
-            'duration_part_p90': analysis['duration_analysis']['spreads']['participants']['p90'],
-            'duration_budget_min_ratio': analysis['duration_analysis']['spreads']['budget']['min_ratio'],
-            'duration_budget_max_ratio': analysis['duration_analysis']['spreads']['budget']['max_ratio'],
-            'duration_budget_mean_ratio': analysis['duration_analysis']['spreads']['budget']['mean_ratio'],
-            'duration_budget_p10': analysis['duration_analysis']['spreads']['budget']['p10'],
-            'duration_budget_p90': analysis['duration_analysis']['spreads']['budget']['p90'],
-        }
-        all_results.append(result)
-
-    return pd.DataFrame(all_results)
+    return merger.create_detailed_results(current_df, past_df, find_similar=find_similar_projects)
 
 
 def create_summary_report(detailed_df):
@@ -295,6 +218,7 @@ def create_hypothesis_comparison(detailed_df):
     return pd.DataFrame(comparison)
 
 
+@profiled()
 def style_excel(ws, df, start_row=1, header_fill='4472C4'):
     header_font = Font(bold=True, color='FFFFFF')
     header_fill_style = PatternFill(start_color=header_fill, end_color=header_fill, fill_type='solid')
@@ -374,8 +298,11 @@ def main():
 
     print(f"Prediction columns: {list(predictions_df.columns)}")
 
+    # A final workbook, written like merger.py's whatever ARTEMIS_EXPORT_XLSX
+    # says; the store goes after it, so load_frame finds the store current.
     print(f"Exporting to {OUTPUT_FILE}...")
     export_to_excel(predictions_df, OUTPUT_FILE)
+    print(f"Saving predictions to {save_frame(predictions_df, OUTPUT_FILE, export_xlsx=False)}")
 
     print("\nAnalysis complete!")
     return predictions_df
@@ -9,6 +9,8 @@ import matplotlib.pyplot as plt
 from matplotlib import rcParams
 from pathlib import Path
 
+from intermediate_store import load_frame
+
 rcParams['font.family'] = 'serif'
 rcParams['font.serif'] = ['Times New Roman', 'DejaVu Serif']
 rcParams['font.size'] = 11
@@ -58,10 +60,107 @@ COLOR_MEAN = '#6A994E'
 COLOR_MAX = '#BC4B51'
 COLOR_ZERO = '#333333'
 
+# Series longer than MAX_POINTS are thinned before drawing when a mode is set:
+# None draws every project, 'quantile' or 'envelope' see downsample(). Both are
+# read when drawing, so setting them after import takes effect.
+DOWNSAMPLE_MODE = None
+MAX_POINTS = 2000
+
+TOP_LINES = [
+    ('current', COLOR_OBSERVED, '-', 2, 'Observed'),
+    ('ci_low', COLOR_CI_LOW, '--', 1.5, 'CI Lower'),
+    ('ci_high', COLOR_CI_HIGH, ':', 1.5, 'CI Upper'),
+]
+BOTTOM_LINES = [
+    ('min', COLOR_MIN, '--', 1.5, 'Pred. Min'),
+    ('mean', COLOR_MEAN, '-', 2, 'Pred. Mean'),
+    ('max', COLOR_MAX, ':', 1.5, 'Pred. Max'),
+]
+
 def to_numeric_safe(series):
     """Convert series to numeric, handling commas."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
     return pd.to_numeric(series.astype(str).str.replace(",", "", regex=False), errors='coerce')
 
+def prepare_numeric(df, columns=None):
+    """Coerce every plotted column to numeric once, for all panels to share."""
+    if columns is None:
+        columns = [col for mapping in COLS.values() for col in mapping.values()]
+    return pd.DataFrame(
+        {col: to_numeric_safe(df[col]) if col in df.columns else np.nan for col in columns},
+        index=df.index
+    )
+
+def sorted_series(df, columns, sort_by):
+    """
+    Numeric values of columns, ordered by the first of sort_by that has data
+    (original order if none has).
+    """
+    series = {col: to_numeric_safe(df[col]) if col in df.columns else pd.Series(np.nan, index=df.index)
+              for col in columns}
+    key = next((series[col] for col in sort_by if series[col].notna().any()), None)
+    order = key.sort_values(ascending=True, na_position='last').index if key is not None else df.index
+    return [series[col].loc[order].to_numpy(dtype=float) for col in columns]
+
+def downsample(x, series_list, mode=None, max_points=None):
+    """
+    Reduce long sorted series to about max_points for drawing.
+
+    'quantile' keeps evenly spaced ranks, shared by all series. 'envelope'
+    splits the ranks into max_points // 2 buckets and returns each bucket's
+    mean as the line plus its (min, max) as a band. Returns (x, lines, bands);
+    bands is None unless mode is 'envelope'. mode and max_points default to
+    DOWNSAMPLE_MODE and MAX_POINTS.
+    """
+    mode = mode or DOWNSAMPLE_MODE
+    max_points = max_points or MAX_POINTS
+    n = len(x)
+    if mode is None or n <= max_points:
+        return x, series_list, None
+    if mode == 'quantile':
+        idx = np.unique(np.linspace(0, n - 1, max_points).round().astype(np.intp))
+        return x[idx], [s[idx] for s in series_list], None
+    if mode == 'envelope':
+        starts = np.unique(np.linspace(0, n, max_points // 2, endpoint=False).astype(np.intp))
+        counts = np.diff(np.append(starts, n))
+        x_mid = x[starts] + (counts - 1) / 2
+        lines, bands = [], []
+        for s in series_list:
+            finite = np.isfinite(s)
+            n_finite = np.add.reduceat(finite, starts)
+            total = np.add.reduceat(np.where(finite, s, 0.0), starts)
+            lines.append(total / np.where(n_finite > 0, n_finite, np.nan))
+            bands.append((np.fmin.reduceat(s, starts), np.fmax.reduceat(s, starts)))
+        return x_mid, lines, bands
+    raise ValueError(f"unknown downsample mode: {mode!r}")
+
+def draw_lines(ax, df, mapping, lines, sort_by, mode=None, max_points=None):
+    """Draw the sorted series of one panel; returns (artist, label) pairs."""
+    series = sorted_series(df, [mapping[key] for key, *_ in lines], [mapping[key] for key in sort_by])
+    x, drawn, bands = downsample(np.arange(len(df)), series, mode, max_points)
+
+    artists = []
+    for i, (_, color, linestyle, linewidth, label) in enumerate(lines):
+        if np.isnan(series[i]).all():
+            continue
+        handle, = ax.plot(x, drawn[i], color=color, linestyle=linestyle, linewidth=linewidth, label=label)
+        if bands is not None:
+            ax.fill_between(x, bands[i][0], bands[i][1], color=color, alpha=0.15, linewidth=0)
+        artists.append((handle, label))
+
+    ax.axhline(0, color=COLOR_ZERO, linewidth=0.8, linestyle='-', alpha=0.5)
+
+    set_ylim_if_exceeds(ax, series)
+
+    ax.set_ylabel('Value', fontsize=11, fontweight='bold')
+    ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.set_xticks([])
+
+    return artists
+
 def set_ylim_if_exceeds(ax, series_list, upper_threshold=YLIM_UPPER_THRESHOLD, lower_bound=YLIM_LOWER):
     """Set y-limits if max value exceeds threshold."""
     max_vals = []
@@ -77,96 +176,19 @@ def set_ylim_if_exceeds(ax, series_list, upper_threshold=YLIM_UPPER_THRESHOLD, l
     if overall_max > upper_threshold:
         ax.set_ylim(lower_bound, upper_threshold)
 
-def plot_top(ax, df, mapping, title):
+def plot_top(ax, df, mapping, title, mode=None, max_points=None):
     """Plot observed values and confidence intervals."""
-    s_cur = to_numeric_safe(df[mapping['current']]) if mapping['current'] in df.columns else pd.Series([np.nan]*len(df))
-    s_low = to_numeric_safe(df[mapping['ci_low']]) if mapping['ci_low'] in df.columns else pd.Series([np.nan]*len(df))
-    s_high = to_numeric_safe(df[mapping['ci_high']]) if mapping['ci_high'] in df.columns else pd.Series([np.nan]*len(df))
-
-    if s_cur.notna().any():
-        order = s_cur.sort_values(ascending=True, na_position='last').index
-    else:
-        order = df.index
-
-    s_cur = s_cur.loc[order].reset_index(drop=True)
-    s_low = s_low.loc[order].reset_index(drop=True)
-    s_high = s_high.loc[order].reset_index(drop=True)
-
-    x = np.arange(len(s_cur))
-
-    artists = []
-
-    if s_cur.notna().any():
-        h_cur, = ax.plot(x, s_cur, color=COLOR_OBSERVED, linewidth=2, label='Observed')
-        artists.append((h_cur, 'Observed'))
-
-    if s_low.notna().any():
-        h_low, = ax.plot(x, s_low, color=COLOR_CI_LOW, linestyle='--', linewidth=1.5, label='CI Lower')
-        artists.append((h_low, 'CI Lower'))
-
-    if s_high.notna().any():
-        h_high, = ax.plot(x, s_high, color=COLOR_CI_HIGH, linestyle=':', linewidth=1.5, label='CI Upper')
-        artists.append((h_high, 'CI Upper'))
-
-    ax.axhline(0, color=COLOR_ZERO, linewidth=0.8, linestyle='-', alpha=0.5)
-
-    set_ylim_if_exceeds(ax, [s_cur, s_low, s_high])
-
+    artists = draw_lines(ax, df, mapping, TOP_LINES, ['current'], mode, max_points)
     ax.set_title(f'{title}', fontweight='bold', fontsize=12, pad=12)
-    ax.set_ylabel('Value', fontsize=11, fontweight='bold')
-    ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.set_xticks([])
-
     return artists
 
-def plot_bottom(ax, df, mapping, title):
+def plot_bottom(ax, df, mapping, title, mode=None, max_points=None):
     """Plot predicted values (min, mean, max)."""
-    s_min = to_numeric_safe(df[mapping['min']]) if mapping['min'] in df.columns else pd.Series([np.nan]*len(df))
-    s_mean = to_numeric_safe(df[mapping['mean']]) if mapping['mean'] in df.columns else pd.Series([np.nan]*len(df))
-    s_max = to_numeric_safe(df[mapping['max']]) if mapping['max'] in df.columns else pd.Series([np.nan]*len(df))
-
-    key = s_mean if s_mean.notna().any() else s_min
-    if key.notna().any():
-        order = key.sort_values(ascending=True, na_position='last').index
-    else:
-        order = df.index
-
-    s_min = s_min.loc[order].reset_index(drop=True)
-    s_mean = s_mean.loc[order].reset_index(drop=True)
-    s_max = s_max.loc[order].reset_index(drop=True)
-
-    x = np.arange(len(s_min))
-
-    artists = []
-
-    if s_min.notna().any():
-        h_min, = ax.plot(x, s_min, color=COLOR_MIN, linestyle='--', linewidth=1.5, label='Pred. Min')
-        artists.append((h_min, 'Pred. Min'))
-
-    if s_mean.notna().any():
-        h_mean, = ax.plot(x, s_mean, color=COLOR_MEAN, linewidth=2, label='Pred. Mean')
-        artists.append((h_mean, 'Pred. Mean'))
-
-    if s_max.notna().any():
-        h_max, = ax.plot(x, s_max, color=COLOR_MAX, linestyle=':', linewidth=1.5, label='Pred. Max')
-        artists.append((h_max, 'Pred. Max'))
+    return draw_lines(ax, df, mapping, BOTTOM_LINES, ['mean', 'min'], mode, max_points)
 
-    ax.axhline(0, color=COLOR_ZERO, linewidth=0.8, linestyle='-', alpha=0.5)
-
-    set_ylim_if_exceeds(ax, [s_min, s_mean, s_max])
-
-    ax.set_ylabel('Value', fontsize=11, fontweight='bold')
-    ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.set_xticks([])
-
-    return artists
-
-def main():
-    df = pd.read_excel(FILE_PATH)
+def build_figure(df, mode=None, max_points=None):
+    """Build the 2x3 interval figure from the applied interval analysis."""
+    df = prepare_numeric(df)
 
     fig, axes = plt.subplots(2, 3, figsize=FIGSIZE)
     fig.suptitle('Interval Analysis: Observed vs. Predicted Values',
@@ -182,14 +204,14 @@ def main():
     titles = ['(a) Participants', '(b) Duration', '(c) Budget']
     for idx, (ax, key, title) in enumerate(zip(axes[0], ['participants', 'duration', 'budget'], titles)):
         mapping = COLS[key]
-        handles = plot_top(ax, df, mapping, title)
+        handles = plot_top(ax, df, mapping, title, mode, max_points)
         if idx == 0:
             collected_handles.extend(handles)
 
     titles = ['(d) Participants', '(e) Duration', '(f) Budget']
     for idx, (ax, key, title) in enumerate(zip(axes[1], ['participants', 'duration', 'budget'], titles)):
         mapping = COLS[key]
-        handles = plot_bottom(ax, df, mapping, title)
+        handles = plot_bottom(ax, df, mapping, title, mode, max_points)
         if idx == 0:
             collected_handles.extend(handles)
 
@@ -206,7 +228,12 @@ def main():
                   frameon=True, fontsize=10, bbox_to_anchor=(0.5, -0.01),
                   framealpha=0.9, edgecolor='black')
 
-    plt.subplots_adjust(top=0.88, bottom=0.10, hspace=0.40, wspace=0.20)
+    fig.subplots_adjust(top=0.88, bottom=0.10, hspace=0.40, wspace=0.20)
+    return fig
+
+def main():
+    df = load_frame(FILE_PATH)
+    build_figure(df)
     plt.show()
 
 if __name__ == "__main__":
@@ -5,8 +5,11 @@ from pathlib import Path
 from docx import Document
 from typing import Dict, List, Any, Optional, Tuple
 
+from profiling import profiled
+
 
 class NarrativeParser:
+    @profiled("NarrativeParser.load")
     def __init__(self, docx_path: str):
         self.docx_path = docx_path
         self.doc = Document(docx_path)
@@ -357,6 +360,7 @@ class NarrativeParser:
 
         return data
 
+    @profiled()
     def parse(self) -> Optional[Dict[str, Any]]:
         """Parse the entire document and return structured data."""
         data = {
@@ -1,32 +1,121 @@
-import random
 import numpy as np
 import pandas as pd
 
-df = pd.read_excel('../data/comparison_data/previous_projects_data.xlsx')
-print(f"Rows incoming: {len(df)}")
+from intermediate_store import CHUNK_ROWS, iter_file, save_frame_chunks
 
-df = df.dropna(subset=['participants'])
-df = df.dropna(subset=['country'])
+SOURCE_FILE = '../data/comparison_data/previous_projects_data.xlsx'
+OUTPUT_FILE = '../data/comparison_data/previous_projects_data_cleaned.xlsx'
 
-for col in ['budget']:
-    df[col] = df[col].fillna(df['budget'].mean()).apply(lambda x: x * random.uniform(0.8, 1.1))
-    df[col] = df[col].clip(lower=0, upper=1000)
+TEXT_COLUMNS = ['theme', 'country']
+NUMERIC_COLUMNS = ['participants', 'budget', 'duration']
 
-numeric_cols = [
-    #'participants', 'duration'
-]
+# Budgets are perturbed by a uniform factor; a fixed seed keeps the cleaned
+# archive (and everything cached downstream of it) identical between runs.
+SEED = 42
+BUDGET_NOISE = (0.8, 1.1)
+BUDGET_MAX = 1000
 
-for col in numeric_cols:
-    q1 = df[col].quantile(0.15)
-    q3 = df[col].quantile(0.85)
-    iqr = q3 - q1
+# Columns clipped to [q_low - k * IQR, q_high + k * IQR]; e.g. ['participants', 'duration'].
+CLIP_COLUMNS = []
+CLIP_QUANTILES = (0.15, 0.85)
+IQR_FACTOR = 1.5
+# Archives longer than this estimate the clipping quantiles from a seeded
+# uniform sample of this many rows instead of every row.
+QUANTILE_SAMPLE = 1_000_000
 
-    lower = q1 - 1.5 * iqr
-    upper = q3 + 1.5 * iqr
 
-    df[col] = df[col].clip(lower=lower, upper=upper)
+def coerce_types(df):
+    """Text columns as strings and metric columns as float64, whatever the chunk held."""
+    return df.assign(
+        **{col: df[col].where(df[col].isna(), df[col].astype(str)) for col in TEXT_COLUMNS if col in df.columns},
+        **{col: pd.to_numeric(df[col], errors='coerce').astype(float) for col in NUMERIC_COLUMNS if col in df.columns}
+    )
 
-df.to_excel('../data/comparison_data/previous_projects_data_cleaned.xlsx', index=False)
 
-print("Data cleaning complete!")
-print(f"Rows remaining: {len(df)}")
+def drop_incomplete(df):
+    return df.dropna(subset=['participants', 'country'])
+
+
+def clip_bounds(values, clip_quantiles=CLIP_QUANTILES, iqr_factor=IQR_FACTOR):
+    """Per-column (lower, upper) clipping bounds of a DataFrame."""
+    q = values.quantile(list(clip_quantiles))
+    iqr = q.iloc[1] - q.iloc[0]
+    return q.iloc[0] - iqr_factor * iqr, q.iloc[1] + iqr_factor * iqr
+
+
+def apply_cleaning(df, rng, budget_mean, bounds=None):
+    budget = df['budget'].fillna(budget_mean).to_numpy(dtype=float)
+    budget = budget * rng.uniform(*BUDGET_NOISE, size=len(budget))
+    df = df.assign(budget=np.clip(budget, 0, BUDGET_MAX))
+
+    if bounds is not None:
+        lower, upper = bounds
+        df[list(lower.index)] = df[list(lower.index)].clip(lower=lower, upper=upper, axis=1)
+
+    return df
+
+
+def clean_past_projects(df, seed=SEED, clip_columns=CLIP_COLUMNS,
+                        clip_quantiles=CLIP_QUANTILES, iqr_factor=IQR_FACTOR):
+    """Clean a past-project frame held in memory."""
+    df = drop_incomplete(coerce_types(df))
+    bounds = clip_bounds(df[clip_columns], clip_quantiles, iqr_factor) if clip_columns else None
+    return apply_cleaning(df, np.random.default_rng(seed), df['budget'].mean(), bounds)
+
+
+def clean_past_projects_chunked(source, seed=SEED, clip_columns=CLIP_COLUMNS, clip_quantiles=CLIP_QUANTILES,
+                                iqr_factor=IQR_FACTOR, chunksize=CHUNK_ROWS, counts=None):
+    """
+    Clean a past-project archive file chunk by chunk, yielding cleaned chunks.
+
+    A first pass gathers the budget mean and, for clipping, a bounded sample
+    of the clipped columns; the second pass cleans and yields each chunk.
+    The noise stream is drawn in row order, so the rows match
+    clean_past_projects() on the whole file (exactly, as long as the archive
+    is no longer than QUANTILE_SAMPLE rows). counts, if given, is filled
+    with the incoming and remaining row counts.
+    """
+    budget_sum, budget_count, rows_in = 0.0, 0, 0
+    sample, sample_keys = None, None
+    sample_rng = np.random.default_rng([seed, 1])
+    for chunk in iter_file(source, chunksize):
+        rows_in += len(chunk)
+        chunk = drop_incomplete(coerce_types(chunk))
+        budget_sum += chunk['budget'].sum()
+        budget_count += chunk['budget'].count()
+        if clip_columns:
+            # Keep the QUANTILE_SAMPLE rows with the smallest random keys seen so far.
+            keys = np.concatenate([sample_keys, sample_rng.random(len(chunk))]) if sample is not None \
+                else sample_rng.random(len(chunk))
+            values = pd.concat([sample, chunk[clip_columns]], ignore_index=True) if sample is not None \
+                else chunk[clip_columns].reset_index(drop=True)
+            if len(keys) > QUANTILE_SAMPLE:
+                keep = np.argpartition(keys, QUANTILE_SAMPLE)[:QUANTILE_SAMPLE]
+                keys, values = keys[keep], values.iloc[keep].reset_index(drop=True)
+            sample, sample_keys = values, keys
+
+    budget_mean = budget_sum / budget_count if budget_count else np.nan
+    bounds = clip_bounds(sample, clip_quantiles, iqr_factor) if sample is not None else None
+
+    rng = np.random.default_rng(seed)
+    rows_out = 0
+    for chunk in iter_file(source, chunksize):
+        chunk = apply_cleaning(drop_incomplete(coerce_types(chunk)), rng, budget_mean, bounds)
+        rows_out += len(chunk)
+        yield chunk.reset_index(drop=True)
+
+    if counts is not None:
+        counts.update(incoming=rows_in, remaining=rows_out)
+
+
+def main():
+    counts = {}
+    save_frame_chunks(clean_past_projects_chunked(SOURCE_FILE, counts=counts), OUTPUT_FILE)
+
+    print(f"Rows incoming: {counts['incoming']}")
+    print("Data cleaning complete!")
+    print(f"Rows remaining: {counts['remaining']}")
+
+
+if __name__ == "__main__":
+    main()
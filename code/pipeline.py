@@ -0,0 +1,335 @@
+"""
+Runs the analysis scripts as a dependency graph.
+
+Each stage declares the artifacts it reads and writes. Its code is its script
+plus every local module the script imports, directly or through other local
+modules; modules it only loads by name are declared under 'modules'. A stage
+is skipped when its code and inputs hash the same as on its last successful
+run and its outputs still exist; independent branches (regression vs.
+interval analysis) run in parallel.
+
+A stage whose inputs are missing (neither produced upstream nor on disk) is
+reported with the missing files and not run; stages downstream of it still
+run from the artifacts already on disk. 'optional_inputs' are read when
+present (their presence is part of the fingerprint) but never hold a stage
+back.
+
+    python pipeline.py                  # refresh everything that is stale
+    python pipeline.py merger --force   # rerun merger and its upstream
+    python pipeline.py --dry-run
+    ARTEMIS_PROFILE=1 python pipeline.py --force   # per-stage timing report
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from artemis_data import CACHE_PATH
+from intermediate_store import STORE_DIR, source_path, store_path
+from profiling import ENABLED as PROFILING, stage_reports
+
+CODE_DIR = Path(__file__).resolve().parent
+STATE_FILE = STORE_DIR / "pipeline_state.json"
+
+ARTEMIS_DATA = "../data/artemis/artemis_data.xlsx"
+ARTEMIS_SOURCE = str(CACHE_PATH)
+ARTEMIS_NUMERIC = "../data/artemis/artemis_data_numeric.xlsx"
+ARTEMIS_REGRESSION = "../data/artemis/artemis_data_for_regression.xlsx"
+ARTEMIS_DP = "../data/artemis/artemis_data_for_DP.xlsx"
+ARTEMIS_CLEANED = "../data/artemis/artemis_data_cleaned.xlsx"
+PAST_PROJECTS = "../data/comparison_data/previous_projects_data.xlsx"
+PAST_PROJECTS_CLEANED = "../data/comparison_data/previous_projects_data_cleaned.xlsx"
+INTERVAL_ANALYSIS = "../data/interval_data/interval_analysis.xlsx"
+INTERVAL_ANALYSIS_SIMPLE = "../data/interval_data/interval_analysis_simple.xlsx"
+INTERVAL_ANALYSIS_APPLIED = "../data/interval_data/interval_analysis_applied.xlsx"
+INTERVAL_ANALYSIS_COHORTS = "../data/interval_data/interval_analysis_cohorts.xlsx"
+RATING_MODEL = "../models/rating_model.joblib"
+
+STAGES = {
+    'past_project_cleaner': {
+        'script': 'past_project_cleaner.py',
+        'inputs': [PAST_PROJECTS],
+        'outputs': [PAST_PROJECTS_CLEANED],
+    },
+    # Parses the application workbook once, so the cleaners below share its
+    # cached copy instead of racing to write it.
+    'artemis_data': {
+        'script': 'artemis_data.py',
+        'inputs': [ARTEMIS_DATA],
+        'outputs': [ARTEMIS_SOURCE],
+    },
+    'artemis_cleaner_numeric': {
+        'script': 'artemis_cleaner_numeric.py',
+        'inputs': [ARTEMIS_SOURCE],
+        'outputs': [ARTEMIS_NUMERIC],
+    },
+    'artemis_cleaner_for_LR': {
+        'script': 'artemis_cleaner_for_LR.py',
+        'inputs': [ARTEMIS_SOURCE],
+        'outputs': [ARTEMIS_REGRESSION],
+    },
+    'artemis_regression': {
+        'script': 'artemis_regression.py',
+        'inputs': [ARTEMIS_REGRESSION],
+        'outputs': [RATING_MODEL],
+    },
+    'merger': {
+        'script': 'merger.py',
+        'inputs': [ARTEMIS_NUMERIC, PAST_PROJECTS_CLEANED],
+        'outputs': [INTERVAL_ANALYSIS],
+    },
+    'merger_simple': {
+        'script': 'merger_simple.py',
+        'inputs': [ARTEMIS_NUMERIC, PAST_PROJECTS_CLEANED],
+        'outputs': [INTERVAL_ANALYSIS_SIMPLE],
+    },
+    'merger_cohorts': {
+        'script': 'merger_cohorts.py',
+        'inputs': [ARTEMIS_NUMERIC, PAST_PROJECTS_CLEANED],
+        'outputs': [INTERVAL_ANALYSIS_COHORTS],
+    },
+    'merger_output_normalizer': {
+        'script': 'merger_output_normalizer.py',
+        'inputs': [INTERVAL_ANALYSIS, INTERVAL_ANALYSIS_SIMPLE],
+        'outputs': [INTERVAL_ANALYSIS_APPLIED],
+    },
+    'artemis_cleaner_for_DP': {
+        'script': 'artemis_cleaner_for_DP.py',
+        'inputs': [ARTEMIS_SOURCE, INTERVAL_ANALYSIS_APPLIED],
+        'outputs': [ARTEMIS_DP],
+    },
+    'artemis_selector': {
+        'script': 'artemis_selector.py',
+        'inputs': [ARTEMIS_DP],
+        'outputs': [],
+    },
+    'render_figures': {
+        'script': 'render_figures.py',
+        # Figure builders are imported by name from render_figures.FIGURES.
+        'modules': ['artemis_review_bar_visualizer.py', 'artemis_review_pie_visualizer.py'],
+        'inputs': [INTERVAL_ANALYSIS_APPLIED, ARTEMIS_REGRESSION, ARTEMIS_DP],
+        # Only the review figures read it; render_figures skips them without it.
+        'optional_inputs': [ARTEMIS_CLEANED],
+        'outputs': [],
+    },
+}
+
+
+def artifact_files(artifact):
+    """Files that hold an artifact: its stored copy and/or its workbook."""
+    candidates = [store_path(artifact), CODE_DIR / artifact]
+    return [path for path in candidates if path.exists()]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def local_imports(script):
+    """Local modules a script imports, directly or through other local modules, as file names."""
+    found = set()
+    pending = [script]
+    while pending:
+        tree = ast.parse((CODE_DIR / pending.pop()).read_text())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                filename = f"{module.split('.')[0]}.py"
+                if filename not in found and (CODE_DIR / filename).exists():
+                    found.add(filename)
+                    pending.append(filename)
+    found.discard(script)
+    return sorted(found)
+
+
+def stage_modules(stage):
+    """Every source file a stage runs: its script, its local imports and its declared modules."""
+    modules = set(local_imports(stage['script']))
+    for module in stage.get('modules', []):
+        modules.update([module] + local_imports(module))
+    modules.discard(stage['script'])
+    return [stage['script']] + sorted(modules)
+
+
+def stage_inputs(stage):
+    return stage['inputs'] + stage.get('optional_inputs', [])
+
+
+def missing_inputs(stage):
+    """Required inputs of a stage that are not on disk."""
+    return [artifact for artifact in stage['inputs'] if source_path(CODE_DIR / artifact) is None]
+
+
+def stage_fingerprint(stage):
+    """Hash of a stage's code and the current content of its inputs (None if a required one is missing)."""
+    digest = hashlib.sha256()
+    for script in stage_modules(stage):
+        digest.update(script.encode())
+        digest.update(file_hash(CODE_DIR / script).encode())
+    for artifact in stage_inputs(stage):
+        # The file load_frame would read: a workbook edited after its store
+        # copy was written is what the stage sees, so it is what is hashed.
+        source = source_path(CODE_DIR / artifact)
+        digest.update(artifact.encode())
+        if source is not None:
+            digest.update(file_hash(source).encode())
+        elif artifact in stage['inputs']:
+            return None
+        else:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def upstream_of(name):
+    """Stages producing any of this stage's inputs."""
+    inputs = set(stage_inputs(STAGES[name]))
+    return [other for other, stage in STAGES.items() if inputs & set(stage['outputs'])]
+
+
+def with_upstream(names):
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(upstream_of(name))
+    return [name for name in STAGES if name in selected]
+
+
+def load_state():
+    if STATE_FILE.exists():
+        return json.loads(STATE_FILE.read_text())
+    return {}
+
+
+def save_state(state):
+    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    STATE_FILE.write_text(json.dumps(state, indent=2, sort_keys=True))
+
+
+def is_up_to_date(name, state):
+    stage = STAGES[name]
+    fingerprint = stage_fingerprint(stage)
+    if fingerprint is None or state.get(name) != fingerprint:
+        return False
+    return all(artifact_files(artifact) for artifact in stage['outputs'])
+
+
+def run_stage(name):
+    env = dict(os.environ, MPLBACKEND='Agg')
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, STAGES[name]['script']],
+        cwd=CODE_DIR, env=env, capture_output=True, text=True
+    )
+    return proc, time.perf_counter() - start
+
+
+def run_pipeline(targets=None, force=False, jobs=None, dry_run=False):
+    """
+    Run the selected stages (and their upstream) in dependency order.
+
+    Returns a dict of stage name -> 'ran', 'skipped', 'missing input',
+    'failed' or 'blocked' ('would run' instead of 'ran' for a dry run).
+    """
+    names = with_upstream(targets) if targets else list(STAGES)
+    state = load_state()
+    status = {}
+    running = {}
+
+    def ready(name):
+        # A stage missing inputs produced nothing new, so its dependents go
+        # ahead with the artifacts already on disk (or report them missing).
+        return all(status.get(dep) in ('ran', 'skipped', 'would run', 'missing input')
+                   for dep in upstream_of(name) if dep in names)
+
+    def blocked(name):
+        return any(status.get(dep) in ('failed', 'blocked') for dep in upstream_of(name) if dep in names)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        while len(status) < len(names):
+            for name in names:
+                if name in status or name in running.values():
+                    continue
+                if blocked(name):
+                    status[name] = 'blocked'
+                    print(f"[blocked] {name}")
+                elif ready(name):
+                    # Check freshness only once upstream has finished, so
+                    # rewritten inputs are hashed in their new state.
+                    stale_upstream = any(status.get(dep) == 'would run' for dep in upstream_of(name))
+                    # In a dry run, inputs a stage upstream would write are not missing.
+                    pending = {artifact for dep in upstream_of(name) if status.get(dep) == 'would run'
+                               for artifact in STAGES[dep]['outputs']}
+                    missing = [artifact for artifact in missing_inputs(STAGES[name]) if artifact not in pending]
+                    if missing:
+                        status[name] = 'missing input'
+                        print(f"[missing input] {name}: {', '.join(missing)}")
+                    elif not force and not stale_upstream and is_up_to_date(name, state):
+                        status[name] = 'skipped'
+                        print(f"[up to date] {name}")
+                    elif dry_run:
+                        status[name] = 'would run'
+                        print(f"[would run] {name}")
+                    else:
+                        print(f"[running] {name}")
+                        running[pool.submit(run_stage, name)] = name
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                proc, elapsed = future.result()
+                if proc.returncode == 0:
+                    status[name] = 'ran'
+                    state[name] = stage_fingerprint(STAGES[name])
+                    save_state(state)
+                    print(f"[done] {name} ({elapsed:.2f}s)")
+                else:
+                    status[name] = 'failed'
+                    print(f"[failed] {name} ({elapsed:.2f}s)")
+                    print(proc.stderr.strip())
+
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ARTeMiS analysis pipeline.")
+    parser.add_argument('stages', nargs='*', help="stages to bring up to date (default: all)")
+    parser.add_argument('--force', action='store_true', help="rerun stages even if up to date")
+    parser.add_argument('--jobs', type=int, default=None, help="maximum stages run in parallel")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would run")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+
+    status = run_pipeline(args.stages, force=args.force, jobs=args.jobs, dry_run=args.dry_run)
+    if PROFILING:
+        # Each stage inherits ARTEMIS_PROFILE and leaves its report in the profile directory.
+        for text in stage_reports([STAGES[name]['script'] for name in STAGES if status.get(name) == 'ran']):
+            print("\n" + text)
+    return 1 if any(s in ('failed', 'blocked') for s in status.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
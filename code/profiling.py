@@ -0,0 +1,192 @@
+"""
+Opt-in profiling hooks for the pipeline's hot paths.
+
+Off unless ARTEMIS_PROFILE is set. While off, @profiled returns the function
+unchanged and section() / count() return immediately, so instrumented code
+pays only a flag check. ARTEMIS_PROFILE is a comma-separated list of:
+
+    1 / timers   call counts and wall time per instrumented section
+    memory       also each section's peak traced memory (tracemalloc)
+    stacks       also a sampling profile of the main thread, written as
+                 collapsed stacks ("a;b;c <samples>" per line) for
+                 flamegraph.pl or speedscope
+
+    ARTEMIS_PROFILE=memory,stacks python merger.py
+    ARTEMIS_PROFILE=1 python pipeline.py --force
+
+At exit each script prints its report to stderr and writes it to
+PROFILE_DIR as <script>.json (and <script>.folded); pipeline.py prints
+the per-stage reports after a run.
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from pathlib import Path
+
+OPTIONS = {opt.strip().lower() for opt in os.environ.get("ARTEMIS_PROFILE", "").split(",")} - {"", "0"}
+ENABLED = bool(OPTIONS)
+TRACE_MEMORY = "memory" in OPTIONS
+SAMPLE_STACKS = "stacks" in OPTIONS
+SAMPLE_INTERVAL = float(os.environ.get("ARTEMIS_PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = Path(os.environ.get("ARTEMIS_PROFILE_DIR")
+                   or Path(os.environ.get("ARTEMIS_STORE_DIR", "../data/intermediate")) / "profile")
+
+_sections = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'peak_bytes': 0})
+_counters = Counter()
+_stacks = Counter()
+_local = threading.local()
+_lock = threading.Lock()
+_started = time.perf_counter()
+_NULL = nullcontext()
+
+
+def _memory_stack():
+    """[start bytes, inner peak] of the sections open in this thread."""
+    if not hasattr(_local, 'memory_stack'):
+        _local.memory_stack = []
+    return _local.memory_stack
+
+
+class _Section:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if TRACE_MEMORY:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            stack = _memory_stack()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            stack.append([current, 0])
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        peak_bytes = 0
+        if TRACE_MEMORY:
+            import tracemalloc
+            stack = _memory_stack()
+            start_bytes, inner_peak = stack.pop()
+            peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+            peak_bytes = peak - start_bytes
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+        with _lock:
+            stats = _sections[self.name]
+            stats['calls'] += 1
+            stats['seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+            stats['peak_bytes'] = max(stats['peak_bytes'], peak_bytes)
+        return False
+
+
+def section(name):
+    """Context manager timing the enclosed block under name."""
+    return _Section(name) if ENABLED else _NULL
+
+
+def count(name, n=1):
+    """Add n to counter name."""
+    if ENABLED:
+        with _lock:
+            _counters[name] += n
+
+
+def profiled(name=None):
+    """Decorator timing every call of a function as a section, named module.function by default."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        module = Path(sys.argv[0]).stem if func.__module__ == "__main__" else func.__module__
+        label = name or f"{module}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Section(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _sample_stacks(main_ident):
+    while True:
+        time.sleep(SAMPLE_INTERVAL)
+        frame = sys._current_frames().get(main_ident)
+        if frame is None:
+            return
+        names = []
+        while frame is not None:
+            names.append(f"{Path(frame.f_code.co_filename).stem}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        _stacks[";".join(reversed(names))] += 1
+
+
+def report():
+    """The collected sections, counters and wall time as a dict."""
+    with _lock:
+        return {
+            'script': Path(sys.argv[0]).stem or "python",
+            'wall_seconds': time.perf_counter() - _started,
+            'sections': {name: dict(stats) for name, stats in _sections.items()},
+            'counters': dict(_counters),
+        }
+
+
+def format_report(data):
+    lines = [f"{data['script']}: {data['wall_seconds']:.2f}s wall"]
+    sections = sorted(data['sections'].items(), key=lambda item: -item[1]['seconds'])
+    memory = any(stats['peak_bytes'] for _, stats in sections)
+    if sections:
+        lines.append(f"  {'section':<40} {'calls':>8} {'total s':>9} {'mean ms':>9} {'max ms':>9}"
+                     + (f" {'peak MB':>8}" if memory else ""))
+    for name, stats in sections:
+        line = (f"  {name:<40} {stats['calls']:>8} {stats['seconds']:>9.3f} "
+                f"{1000 * stats['seconds'] / stats['calls']:>9.2f} {1000 * stats['max_seconds']:>9.2f}")
+        if memory:
+            line += f" {stats['peak_bytes'] / 2 ** 20:>8.1f}"
+        lines.append(line)
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f"  {name:<40} {value:>8}")
+    return "\n".join(lines)
+
+
+def _write_report():
+    data = report()
+    print("\n" + format_report(data), file=sys.stderr)
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{data['script']}.json").write_text(json.dumps(data, indent=2))
+    if SAMPLE_STACKS:
+        with open(PROFILE_DIR / f"{data['script']}.folded", "w") as f:
+            for stack, samples in sorted(_stacks.items()):
+                f.write(f"{stack} {samples}\n")
+
+
+def stage_reports(stages, directory=PROFILE_DIR):
+    """Formatted reports written by the given scripts, in order, skipping missing ones."""
+    reports = []
+    for stage in stages:
+        path = Path(directory) / f"{Path(stage).stem}.json"
+        if path.exists():
+            reports.append(format_report(json.loads(path.read_text())))
+    return reports
+
+
+if ENABLED:
+    if TRACE_MEMORY:
+        import tracemalloc
+        tracemalloc.start()
+    if SAMPLE_STACKS:
+        threading.Thread(target=_sample_stacks, args=(threading.main_thread().ident,), daemon=True).start()
+    atexit.register(_write_report)
@@ -0,0 +1,130 @@
+"""
+Saved rating regression and batch scoring of new applications.
+
+artemis_regression.py trains the model and writes it with save_model(); the
+artifact holds the fitted pipeline together with the feature columns it was
+trained on, a hash of the training data and the library versions, so a
+prediction never needs the training workbook. The model is loaded on first
+use and kept for later calls.
+
+    python rating_model.py incoming.csv                # print predicted ratings
+    python rating_model.py incoming.xlsx --out scored.csv
+"""
+
+import argparse
+import hashlib
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+MODEL_PATH = Path("../models/rating_model.joblib")
+ARTIFACT_FORMAT = 1
+TARGET = "Rating"
+
+_loaded = {}
+
+
+def data_hash(X, y):
+    """Content hash of the training features and target."""
+    digest = hashlib.sha256()
+    digest.update(",".join(map(str, X.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def save_model(model, X, y, path=MODEL_PATH, metrics=None):
+    """Write a fitted pipeline and its feature schema as a versioned artifact."""
+    import joblib
+    import sklearn
+
+    artifact = {
+        'format': ARTIFACT_FORMAT,
+        'model': model,
+        'features': list(X.columns),
+        'dtypes': {col: str(dtype) for col, dtype in X.dtypes.items()},
+        'target': TARGET,
+        'data_hash': data_hash(X, y),
+        'n_samples': len(X),
+        'metrics': metrics or {},
+        'sklearn_version': sklearn.__version__,
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(artifact, tmp)
+    tmp.replace(path)
+    _loaded.pop(str(path), None)
+    return path
+
+
+def load_model(path=MODEL_PATH):
+    """The saved artifact, read once per process (and again if the file changes)."""
+    path = Path(path)
+    mtime = path.stat().st_mtime
+    cached = _loaded.get(str(path))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    import joblib
+    import sklearn
+
+    artifact = joblib.load(path)
+    if artifact.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"{path}: artifact format {artifact.get('format')}, expected {ARTIFACT_FORMAT}; "
+                         f"retrain with artemis_regression.py")
+    if artifact['sklearn_version'] != sklearn.__version__:
+        print(f"Warning: {path} was saved with scikit-learn {artifact['sklearn_version']}, "
+              f"running {sklearn.__version__}")
+    _loaded[str(path)] = (mtime, artifact)
+    return artifact
+
+
+def feature_frame(applications, features):
+    """The model's feature columns from an applications frame, as numbers."""
+    missing = [col for col in features if col not in applications.columns]
+    if missing:
+        raise ValueError(f"applications are missing feature columns: {', '.join(missing)}")
+    return applications[features].apply(pd.to_numeric, errors='coerce')
+
+
+def predict(applications, path=MODEL_PATH):
+    """Predicted rating for every row of an applications DataFrame."""
+    artifact = load_model(path)
+    X = feature_frame(applications, artifact['features'])
+    return pd.Series(artifact['model'].predict(X), index=applications.index, name=f"predicted_{TARGET.lower()}")
+
+
+def read_applications(path):
+    path = Path(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score new applications with the saved rating model.")
+    parser.add_argument('applications', help="CSV, Parquet or Excel file of applications")
+    parser.add_argument('--model', default=str(MODEL_PATH), help="model artifact")
+    parser.add_argument('--out', help="write the scored applications here (.csv or .xlsx)")
+    args = parser.parse_args()
+
+    applications = read_applications(args.applications)
+    scored = applications.assign(**{f"predicted_{TARGET.lower()}": predict(applications, args.model)})
+
+    if args.out is None:
+        print(scored.to_string(index=False))
+    elif args.out.endswith(".csv"):
+        scored.to_csv(args.out, index=False)
+    else:
+        scored.to_excel(args.out, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Tracks which rendered figures are current.
+
+A figure's key hashes the slice of the DataFrame it is drawn from, its plot
+parameters, and the source of the module that draws it and of the modules
+that builder relies on. Keys are kept in a
+manifest next to the PNGs, so a figure whose key is unchanged and whose file
+still exists does not need to be redrawn.
+"""
+
+import hashlib
+import importlib.util
+import json
+from pathlib import Path
+
+import pandas as pd
+
+MANIFEST_NAME = ".render_cache.json"
+
+
+def _source_hash(module_name):
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or spec.origin is None:
+        return ''
+    return hashlib.sha256(Path(spec.origin).read_bytes()).hexdigest()
+
+
+def figure_key(df, builder, columns=None, params=None, deps=None):
+    """
+    Hash of the data slice, parameters and drawing code behind a figure.
+    deps names further modules whose code the builder calls into.
+    """
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    digest = hashlib.sha256()
+    digest.update(builder.encode())
+    for module_name in [builder.rsplit('.', 1)[0]] + sorted(deps or []):
+        digest.update(_source_hash(module_name).encode())
+    digest.update(json.dumps([str(col) for col in df.columns]).encode())
+    digest.update(json.dumps([str(dtype) for dtype in df.dtypes]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(out_dir):
+    path = Path(out_dir) / MANIFEST_NAME
+    if path.exists():
+        return json.loads(path.read_text())
+    return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = Path(out_dir) / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def is_current(manifest, out_dir, name, key):
+    return manifest.get(name) == key and (Path(out_dir) / name).exists()
@@ -0,0 +1,222 @@
+"""
+Headless batch rendering of every figure in ../visualizations/.
+
+Each input workbook is loaded once in this process and the figures are drawn
+on the Agg backend across a process pool, so no display is needed and the
+full set regenerates in one job. Figures whose input slice, parameters and
+drawing code are unchanged since their last render are skipped (see
+render_cache).
+
+    python render_figures.py                    # all stale figures
+    python render_figures.py range.png dp.png   # a subset
+    python render_figures.py --force            # redraw regardless of the cache
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+os.environ['MPLBACKEND'] = 'Agg'
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from artemis_selector import (MAX_BUDGET, THEME_DIVERSITY_FACTOR, COUNTRY_DIVERSITY_FACTOR,
+                               INCOMING_IDS)
+from intermediate_store import load_frame
+from artemis_visualizer import PREDICTORS
+from merger_visualizer import COLS
+from render_cache import figure_key, is_current, load_manifest, save_manifest
+
+FIGURE_DIR = Path("../visualizations")
+
+INTERVAL_ANALYSIS_APPLIED = "../data/interval_data/interval_analysis_applied.xlsx"
+ARTEMIS_REGRESSION = "../data/artemis/artemis_data_for_regression.xlsx"
+ARTEMIS_CLEANED = "../data/artemis/artemis_data_cleaned.xlsx"
+ARTEMIS_DP = "../data/artemis/artemis_data_for_DP.xlsx"
+
+# columns: the slice of the input a figure is drawn from (None: all of it),
+# params: plot parameters that are not in the data, deps: modules besides the
+# builder's own whose code draws the figure. All feed the cache key.
+FIGURES = {
+    'range.png': {
+        'data': INTERVAL_ANALYSIS_APPLIED,
+        'builder': 'merger_visualizer.build_figure',
+        'columns': [col for mapping in COLS.values() for col in mapping.values()],
+    },
+    'correlation.png': {
+        'data': ARTEMIS_REGRESSION,
+        'builder': 'artemis_visualizer.plot_correlation',
+        'columns': None,
+    },
+    'polynomial_regression.png': {
+        'data': ARTEMIS_REGRESSION,
+        'builder': 'artemis_visualizer.plot_polynomial_regression',
+        'columns': ['Rating'] + PREDICTORS,
+    },
+    'distribution.png': {
+        'data': ARTEMIS_CLEANED,
+        'builder': 'artemis_review_bar_visualizer.build_figure',
+        'columns': None,
+    },
+    'diversity.png': {
+        'data': ARTEMIS_CLEANED,
+        'builder': 'artemis_review_pie_visualizer.build_figure',
+        'columns': None,
+    },
+    'dp.png': {
+        'data': ARTEMIS_DP,
+        'builder': 'render_figures.selected_timeline',
+        'deps': ['artemis_selector'],
+        'columns': ['ID', 'country', 'theme', 'participants', 'budget', 'rating', 'debut', 'duration'],
+        'params': {
+            'max_budget': MAX_BUDGET,
+            'theme_diversity_factor': THEME_DIVERSITY_FACTOR,
+            'country_diversity_factor': COUNTRY_DIVERSITY_FACTOR,
+        },
+    },
+    'incoming.png': {
+        'data': ARTEMIS_DP,
+        'builder': 'render_figures.incoming_timeline',
+        'deps': ['artemis_selector'],
+        'columns': ['ID', 'debut', 'duration', 'participants'],
+        'params': {'selected_ids': INCOMING_IDS},
+    },
+}
+
+_MODULE_RC = {}
+
+
+def selected_timeline(df):
+    from artemis_selector import select_projects_dp, plot_participation_timeline
+    selected = select_projects_dp(None, MAX_BUDGET, THEME_DIVERSITY_FACTOR, COUNTRY_DIVERSITY_FACTOR, df=df)
+    return plot_participation_timeline(None, selected, df=df)
+
+
+def incoming_timeline(df):
+    from artemis_selector import plot_participation_timeline
+    return plot_participation_timeline(None, INCOMING_IDS, df=df)
+
+
+def _module_rc(module_name):
+    """
+    rcParams a visualizer module sets up at import, captured once per worker.
+
+    The visualizers configure matplotlib globally when imported, so each
+    figure is drawn inside its own module's settings rather than whichever
+    module happened to be imported last.
+    """
+    if module_name not in _MODULE_RC:
+        with plt.rc_context():
+            plt.rcdefaults()
+            if module_name in sys.modules:
+                importlib.reload(sys.modules[module_name])
+            else:
+                importlib.import_module(module_name)
+            _MODULE_RC[module_name] = {k: v for k, v in plt.rcParams.items() if k != 'backend'}
+    return _MODULE_RC[module_name]
+
+
+def render_figure(name, builder, df, out_dir=FIGURE_DIR):
+    """Draw one figure with its builder and save it as out_dir/name."""
+    module_name, func_name = builder.rsplit('.', 1)
+    with plt.rc_context(_module_rc(module_name)):
+        func = getattr(importlib.import_module(module_name), func_name)
+        fig = func(df)
+        if isinstance(fig, tuple):
+            fig = fig[0]
+        path = Path(out_dir) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fig.savefig(path, bbox_inches='tight')
+        plt.close(fig)
+    return path
+
+
+def load_inputs(names):
+    """Load every input workbook once; missing inputs map to None."""
+    frames = {}
+    for name in names:
+        data_path = FIGURES[name]['data']
+        if data_path not in frames:
+            try:
+                frames[data_path] = load_frame(data_path)
+            except FileNotFoundError:
+                frames[data_path] = None
+    return frames
+
+
+def render_all(names=None, jobs=None, out_dir=FIGURE_DIR, force=False):
+    """
+    Render the named figures (default: all).
+
+    Returns a dict of figure name -> 'rendered', 'cached' (already current),
+    'skipped' (input not found) or 'failed'.
+    """
+    names = list(names or FIGURES)
+    frames = load_inputs(names)
+    manifest = load_manifest(out_dir)
+    keys = {}
+    results = {}
+
+    todo = []
+    for name in names:
+        figure = FIGURES[name]
+        df = frames[figure['data']]
+        if df is None:
+            print(f"[skipped] {name}: {figure['data']} not found")
+            results[name] = 'skipped'
+            continue
+        keys[name] = figure_key(df, figure['builder'], figure['columns'], figure.get('params'), figure.get('deps'))
+        if not force and is_current(manifest, out_dir, name, keys[name]):
+            print(f"[cached] {name}")
+            results[name] = 'cached'
+        else:
+            todo.append((name, figure['builder'], df))
+
+    def rendered(name, path):
+        print(f"[rendered] {path}")
+        results[name] = 'rendered'
+        manifest[name] = keys[name]
+        save_manifest(out_dir, manifest)
+
+    if not todo:
+        return results
+
+    if jobs == 1:
+        for name, builder, df in todo:
+            rendered(name, render_figure(name, builder, df, out_dir))
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(render_figure, name, builder, df, out_dir): name for name, builder, df in todo}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                rendered(name, future.result())
+            except Exception as e:
+                results[name] = 'failed'
+                print(f"[failed] {name}: {e!r}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render all ARTeMiS figures headlessly.")
+    parser.add_argument('figures', nargs='*', help="figures to render (default: all)")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (1 renders in-process)")
+    parser.add_argument('--out', default=str(FIGURE_DIR), help="output directory")
+    parser.add_argument('--force', action='store_true', help="redraw figures even if current")
+    args = parser.parse_args()
+    unknown = [name for name in args.figures if name not in FIGURES]
+    if unknown:
+        parser.error(f"unknown figures: {', '.join(unknown)} (choose from {', '.join(FIGURES)})")
+
+    results = render_all(args.figures, jobs=args.jobs, out_dir=args.out, force=args.force)
+    return 1 if 'failed' in results.values() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Compact dtypes for project frames.
+
+Theme and country become categoricals with whitespace-trimmed categories, so
+a theme filter compares integer codes against the few categories that match
+instead of normalizing every row's string. Metric columns get one fixed dtype
+whatever their values: int64 for integer columns, float64 for everything else.
+A dtype sized to each frame's own data (int8 for small archives) would make
+arithmetic between frames overflow, and float32 would change the arithmetic
+the similarity windows and ratios are computed with. Whole-number float
+columns (budgets usually are) stay float64, so they are written to the
+workbooks as before.
+"""
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ['theme', 'country']
+METRIC_COLUMNS = ['participants', 'budget', 'duration']
+
+
+def label_key(label):
+    """Normalized form two labels must share to be treated as the same theme/country."""
+    if label is None or (isinstance(label, float) and np.isnan(label)):
+        return None
+    return str(label).strip().lower()
+
+
+def as_category(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    labels = series.where(series.isna(), series.astype(str).str.strip())
+    return labels.astype('category')
+
+
+def coerce_metric(series):
+    values = pd.to_numeric(series, errors='coerce')
+    if pd.api.types.is_integer_dtype(values) and not values.isna().any():
+        return values.astype(np.int64)
+    return values.astype(float)
+
+
+def apply_schema(df):
+    """Copy of df with categorical labels and fixed-dtype metrics, where present."""
+    return df.assign(
+        **{col: as_category(df[col]) for col in CATEGORICAL_COLUMNS if col in df.columns},
+        **{col: coerce_metric(df[col]) for col in METRIC_COLUMNS if col in df.columns}
+    )
+
+
+def label_mask(series, label):
+    """
+    Boolean array of rows whose label matches `label` after normalization.
+    On a categorical only the categories are normalized and rows are matched
+    by code.
+    """
+    key = label_key(label)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        matching = [i for i, category in enumerate(categories) if label_key(category) == key]
+        return np.isin(series.cat.codes.to_numpy(), matching)
+    return (series.astype(str).str.strip().str.lower() == key).to_numpy()
@@ -0,0 +1,171 @@
+"""
+Local scoring service for incoming applications.
+
+Keeps the saved rating model, the past-project similarity index and the
+current select_projects_dp portfolio in memory, and scores batches of new
+applications against them:
+
+    python scoring_service.py --port 8765
+    curl -X POST localhost:8765/score -d '{"applications": [{"ID": "new-1",
+        "theme": "Education", "country": "Kyrgyzstan", "participants": 60,
+        "budget": 800, "duration": 30, "staff": 5}]}'
+
+Each application gets its predicted rating, predicted participant, budget and
+duration intervals (min / mean / max from its nearest past projects, as in
+merger.py's predictions sheet) and whether it would join the portfolio
+(joins_portfolio). Membership re-solves the selection over every candidate
+plus the batch, which takes as long as artemis_selector.py itself. A request
+with "exact": false only re-solves over the current portfolio plus the batch,
+well under a second for small batches; that can keep an application the full
+selection would drop, so it is reported as joins_reduced_portfolio instead.
+"""
+
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+import merger
+from artemis_selector import (DATA_PATH as PORTFOLIO_FILE, MAX_BUDGET, THEME_DIVERSITY_FACTOR,
+                               COUNTRY_DIVERSITY_FACTOR, select_projects_dp)
+from intermediate_store import load_frame
+from rating_model import MODEL_PATH, TARGET, feature_frame, load_model
+from similarity_index import SimilarityIndex
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Regression feature -> application field.
+MODEL_FIELDS = {
+    "Target Audience": "participants",
+    "Duration": "duration",
+    "Staff": "staff",
+    "Budget": "budget",
+}
+APPLICATION_FIELDS = ["theme", "country", "participants", "budget", "duration", "staff"]
+INTERVAL_COLUMNS = [
+    f"{metric}_pred_{stat}"
+    for metric in ["participants", "budget", "duration"]
+    for stat in ["min", "mean", "max"]
+]
+
+
+class ScoringService:
+    def __init__(self, model_path=MODEL_PATH, past_file=merger.PAST_FILE, portfolio_file=PORTFOLIO_FILE):
+        start = time.perf_counter()
+        self.model = load_model(model_path)
+        self.index = SimilarityIndex.from_frame(load_frame(past_file), filter_by_theme=merger.FILTER_BY_THEME)
+        self.candidates = load_frame(portfolio_file)
+        self.portfolio = select_projects_dp(
+            None, MAX_BUDGET, THEME_DIVERSITY_FACTOR, COUNTRY_DIVERSITY_FACTOR, df=self.candidates
+        )
+        self._lock = Lock()
+        print(f"Scoring service ready in {time.perf_counter() - start:.1f}s "
+              f"({len(self.index.values)} past projects, portfolio of {len(self.portfolio)})")
+
+    def predict_ratings(self, applications):
+        features = applications.rename(columns={field: feature for feature, field in MODEL_FIELDS.items()})
+        X = feature_frame(features, self.model['features'])
+        return self.model['model'].predict(X)
+
+    def predict_intervals(self, applications):
+        detailed = merger.create_detailed_results(applications, None, mode='knn', index=self.index)
+        predictions = merger.create_predictions_sheet(detailed).set_index('project_index')
+        return predictions.loc[applications.index, INTERVAL_COLUMNS]
+
+    def portfolio_membership(self, applications, ratings, exact=True):
+        """
+        Whether each application is selected when the portfolio is re-solved
+        with the batch: over every candidate, or only over the current
+        portfolio when exact is False.
+        """
+        pool = self.candidates if exact else self.candidates[self.candidates['ID'].isin(self.portfolio)]
+        incoming = applications.assign(rating=ratings)[["ID", "country", "theme", "participants", "budget", "rating"]]
+        with self._lock:
+            selected = select_projects_dp(
+                None, MAX_BUDGET, THEME_DIVERSITY_FACTOR, COUNTRY_DIVERSITY_FACTOR,
+                df=pd.concat([pool, incoming], ignore_index=True)
+            )
+        return applications["ID"].isin(selected).to_numpy()
+
+    def score(self, applications, exact=True):
+        """Score a DataFrame of applications; returns one row per application."""
+        missing = [field for field in APPLICATION_FIELDS if field not in applications.columns]
+        if missing:
+            raise ValueError(f"applications are missing fields: {', '.join(missing)}")
+
+        applications = applications.reset_index(drop=True)
+        default_ids = pd.Series([f"new-{i + 1}" for i in range(len(applications))])
+        ids = applications["ID"] if "ID" in applications.columns else default_ids
+        applications = applications.assign(
+            ID=ids.where(ids.notna(), default_ids).astype(str),
+            **{field: pd.to_numeric(applications[field], errors='coerce')
+               for field in ["participants", "budget", "duration", "staff"]}
+        )
+
+        ratings = self.predict_ratings(applications)
+        intervals = self.predict_intervals(applications)
+        joins = self.portfolio_membership(applications, ratings, exact)
+
+        return pd.concat([
+            applications[["ID"]],
+            pd.DataFrame({f"predicted_{TARGET.lower()}": ratings}),
+            intervals.reset_index(drop=True),
+            pd.DataFrame({"joins_portfolio" if exact else "joins_reduced_portfolio": joins}),
+        ], axis=1)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._reply(404, {"error": "not found"})
+            self._reply(200, {"status": "ok", "portfolio": [str(i) for i in service.portfolio]})
+
+        def do_POST(self):
+            if self.path != "/score":
+                return self._reply(404, {"error": "not found"})
+            start = time.perf_counter()
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                scored = service.score(pd.DataFrame(request["applications"]), exact=bool(request.get("exact", True)))
+            except (KeyError, ValueError, TypeError) as e:
+                return self._reply(400, {"error": str(e)})
+            results = scored.replace({np.nan: None}).to_dict(orient="records")
+            self._reply(200, {"results": results, "seconds": round(time.perf_counter() - start, 4)})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve rating, interval and portfolio predictions.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--model', default=str(MODEL_PATH), help="model artifact")
+    args = parser.parse_args()
+
+    service = ScoringService(model_path=args.model)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Listening on http://{args.host}:{args.port} (POST /score, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+How robust the selected portfolio is to uncertain participants and budgets.
+
+Each scenario draws every project's participants and budget uniformly within
+its predicted interval (the min / max predictions merger writes to
+interval_analysis_applied) and re-solves the selection. A project without a
+prediction keeps its own numbers. The draws are made up front from one
+seed, so results do not depend on the number of workers.
+
+Scenarios are solved in a process pool. The candidate arrays are prepared
+once (prepare_items) and handed to each worker as it starts, so a task only
+carries its draws. The report gives each project's inclusion frequency
+across scenarios, next to whether the point-estimate selection includes it:
+
+    python selection_robustness.py --samples 1000 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from artemis_cleaner_for_DP import PREDICTIONS_FILE
+from artemis_selector import (DATA_PATH, MAX_BUDGET, THEME_DIVERSITY_FACTOR, COUNTRY_DIVERSITY_FACTOR,
+                              prepare_items, solve_prepared)
+from intermediate_store import load_frame, save_frame
+
+N_SAMPLES = 1000
+SEED = 42
+CHUNK_SAMPLES = 20
+MAX_STATES = 200_000
+OUTPUT_FILE = "../data/artemis/selection_robustness.xlsx"
+
+# Sampled column -> (low, high) prediction columns.
+INTERVALS = {
+    'participants': ('participants_pred_min', 'participants_pred_max'),
+    'budget': ('budget_pred_min', 'budget_pred_max'),
+}
+
+_worker = {}
+
+
+def load_intervals(projects, predictions):
+    """
+    (low, high) arrays per sampled column, aligned with projects. Intervals
+    are matched to projects on ID: project_index is the row label of the
+    application, which the DP frame keeps. Missing or inverted bounds fall
+    back to the project's own value.
+    """
+    pred = predictions.assign(ID=projects.loc[predictions['project_index'], 'ID'].to_numpy())
+    pred = pred.drop_duplicates('ID').set_index('ID').reindex(projects['ID'])
+
+    intervals = {}
+    for column, (low_col, high_col) in INTERVALS.items():
+        own = projects[column].fillna(0).to_numpy(dtype=float)
+        low = np.clip(np.nan_to_num(pred[low_col].to_numpy(dtype=float), nan=own), 0, None)
+        high = np.clip(np.nan_to_num(pred[high_col].to_numpy(dtype=float), nan=own), 0, None)
+        intervals[column] = np.minimum(low, high), np.maximum(low, high)
+    return intervals
+
+
+def draw_scenarios(intervals, n_samples=N_SAMPLES, seed=SEED):
+    """(n_samples, projects) integer draws per sampled column."""
+    rng = np.random.default_rng(seed)
+    return {
+        column: np.rint(rng.uniform(low, high, size=(n_samples, len(low)))).astype(np.int64)
+        for column, (low, high) in intervals.items()
+    }
+
+
+def _init_worker(prepared, settings):
+    _worker.update(prepared=prepared, settings=settings)
+
+
+def _solve_chunk(participants, budget):
+    """Inclusion mask (scenarios, projects) of a chunk of scenarios."""
+    prepared = _worker['prepared']
+    included = np.zeros(participants.shape, dtype=bool)
+    for i in range(len(participants)):
+        solution = solve_prepared(prepared, *_worker['settings'], participants=participants[i], budget=budget[i])
+        if solution is not None:
+            included[i, solution[0]] = True
+    return included
+
+
+def inclusion_frequency(projects, predictions, n_samples=N_SAMPLES, seed=SEED, workers=None,
+                        max_budget=MAX_BUDGET, theme_diversity_factor=THEME_DIVERSITY_FACTOR,
+                        country_diversity_factor=COUNTRY_DIVERSITY_FACTOR, max_states=MAX_STATES):
+    """
+    Share of scenarios in which each project is selected, with the baseline
+    (point estimate) selection for comparison, most robust first.
+    """
+    prepared = prepare_items(projects)
+    settings = (max_budget, theme_diversity_factor, country_diversity_factor, max_states)
+    draws = draw_scenarios(load_intervals(projects, predictions), n_samples, seed)
+    chunks = [
+        (draws['participants'][lo:lo + CHUNK_SAMPLES], draws['budget'][lo:lo + CHUNK_SAMPLES])
+        for lo in range(0, n_samples, CHUNK_SAMPLES)
+    ]
+
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        _init_worker(prepared, settings)
+        included = [_solve_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(prepared, settings)) as pool:
+            included = list(pool.map(_solve_chunk, *zip(*chunks)))
+    included = np.concatenate(included) if included else np.zeros((0, len(projects)), dtype=bool)
+
+    baseline = np.zeros(len(projects), dtype=bool)
+    solution = solve_prepared(prepared, *settings)
+    if solution is not None:
+        baseline[solution[0]] = True
+
+    report = projects[['ID', 'theme', 'country', 'participants', 'budget', 'rating']].assign(
+        selected=baseline,
+        inclusion_frequency=included.mean(axis=0) if n_samples else np.nan,
+    )
+    return report.sort_values(['inclusion_frequency', 'rating'], ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo inclusion frequency of the selected portfolio.")
+    parser.add_argument('--samples', type=int, default=N_SAMPLES)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: all CPUs)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = inclusion_frequency(load_frame(DATA_PATH), load_frame(PREDICTIONS_FILE),
+                                 n_samples=args.samples, seed=args.seed, workers=args.workers)
+    print(report.to_string(index=False))
+    print(f"\n{args.samples} scenarios in {time.perf_counter() - start:.1f}s")
+    save_frame(report, OUTPUT_FILE)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
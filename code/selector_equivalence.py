@@ -0,0 +1,147 @@
+"""
+Checks solve_prepared() against the original dict-based selection DP.
+
+The original select_projects_dp had a stray `return []` inside its final
+loop, so it always selected nothing. reference_selection() is that code with
+the return moved after the loop, where it only fires when no selection is
+feasible. The array DP must pick the same projects on the DP candidates and
+on random instances, with and without pruning:
+
+    python selector_equivalence.py
+    python selector_equivalence.py --instances 500 --max-states 50 500
+"""
+
+import argparse
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+from artemis_selector import (DATA_PATH, MAX_BUDGET, THEME_DIVERSITY_FACTOR, COUNTRY_DIVERSITY_FACTOR,
+                              prepare_items, solve_prepared)
+from intermediate_store import load_frame
+
+MAX_STATES = [50, 500, 200_000]
+N_INSTANCES = 100
+SEED = 0
+
+
+def reference_selection(df, max_budget, theme_diversity_factor, country_diversity_factor, max_states=200_000):
+    """Selected IDs by the original dict DP, with its final-loop return fixed."""
+    df = df.copy()
+    df['budget'] = df['budget'].fillna(0).astype(int)
+    df['participants'] = df['participants'].fillna(0).astype(int)
+    df['rating'] = df['rating'].fillna(0.0).astype(float)
+    df['ID'] = df['ID'].astype(object)
+
+    themes = sorted(df['theme'].astype(str).unique())
+    countries = sorted(df['country'].astype(str).unique())
+    theme_index = {t: i for i, t in enumerate(themes)}
+    country_index = {c: i for i, c in enumerate(countries)}
+    T = len(themes)
+
+    items = []
+    for _, row in df.iterrows():
+        items.append({
+            'id': row['ID'],
+            'theme_idx': theme_index[str(row['theme'])],
+            'country_idx': country_index[str(row['country'])],
+            'participants': int(row['participants']),
+            'budget': int(row['budget']),
+            'rating': float(row['rating'])
+        })
+
+    dp = {(0, 0, tuple([0] * (T + len(countries)))): ((0.0, 0, 0), tuple())}
+    for it in items:
+        for (sel_count, budget_used, counts_tuple), (obj_tuple, sel_ids) in list(dp.items()):
+            new_budget = budget_used + it['budget']
+            if new_budget <= max_budget:
+                counts_list = list(counts_tuple)
+                counts_list[it['theme_idx']] += 1
+                counts_list[T + it['country_idx']] += 1
+                new_obj = (obj_tuple[0] + it['rating'], obj_tuple[1] + it['participants'],
+                           obj_tuple[2] - it['budget'])
+                key = (sel_count + 1, new_budget, tuple(counts_list))
+                prev = dp.get(key)
+                if (prev is None) or (new_obj > prev[0]):
+                    dp[key] = (new_obj, sel_ids + (it['id'],))
+
+        if len(dp) > max_states:
+            scored = [(v[0], k, v[1]) for k, v in dp.items()]
+            scored.sort(reverse=True, key=lambda x: x[0])
+            dp = {k: (obj, sel_ids) for (obj, k, sel_ids) in scored[:max_states]}
+
+    best_solution = None
+    for (k, budget_used, counts_tuple), (obj_tuple, sel_ids) in dp.items():
+        if k == 0 or budget_used > max_budget:
+            continue
+        max_theme = max(counts_tuple[:T]) if T else 0
+        max_country = max(counts_tuple[T:]) if len(counts_tuple) > T else 0
+        if (max_theme <= math.floor(theme_diversity_factor * k)
+                and max_country <= math.floor(country_diversity_factor * k)):
+            if (best_solution is None) or (obj_tuple > best_solution[0]):
+                best_solution = (obj_tuple, sel_ids)
+
+    if best_solution is None:
+        return []
+    return list(best_solution[1])
+
+
+def array_selection(df, max_budget, theme_diversity_factor, country_diversity_factor, max_states=200_000):
+    prepared = prepare_items(df)
+    solution = solve_prepared(prepared, max_budget, theme_diversity_factor, country_diversity_factor, max_states)
+    return [] if solution is None else list(prepared['ids'][solution[0]])
+
+
+def random_instance(rng):
+    n = int(rng.integers(1, 16))
+    return pd.DataFrame({
+        'ID': np.arange(n),
+        'theme': rng.choice(['a', 'b', 'c'], n),
+        'country': rng.choice(['x', 'y', 'z', 'w'], n),
+        # Few distinct ratings and participants, so ties are common.
+        'participants': rng.integers(0, 5, n) * 10,
+        'budget': rng.integers(1, 8, n) * 100,
+        'rating': rng.integers(0, 4, n) * 10.0,
+    })
+
+
+def check(df, max_states, max_budget=MAX_BUDGET, theme_diversity_factor=THEME_DIVERSITY_FACTOR,
+          country_diversity_factor=COUNTRY_DIVERSITY_FACTOR):
+    args = (max_budget, theme_diversity_factor, country_diversity_factor, max_states)
+    return reference_selection(df, *args), array_selection(df, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the array selection DP against the original.")
+    parser.add_argument('--instances', type=int, default=N_INSTANCES, help="random instances per max_states")
+    parser.add_argument('--max-states', type=int, nargs='+', default=MAX_STATES)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    mismatches = 0
+    candidates = load_frame(DATA_PATH)
+    for max_states in args.max_states:
+        expected, actual = check(candidates, max_states)
+        status = "ok" if expected == actual else "MISMATCH"
+        mismatches += expected != actual
+        print(f"DP candidates, max_states={max_states}: {len(actual)} selected, {status}")
+
+    rng = np.random.default_rng(args.seed)
+    for max_states in args.max_states:
+        failed = 0
+        for _ in range(args.instances):
+            df = random_instance(rng)
+            max_budget = int(rng.integers(100, 2000))
+            theme_factor, country_factor = rng.uniform(0.3, 1.0, 2)
+            expected, actual = check(df, max_states, max_budget, theme_factor, country_factor)
+            failed += expected != actual
+        mismatches += failed
+        print(f"{args.instances} random instances, max_states={max_states}: {failed} mismatches")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
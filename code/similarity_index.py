@@ -0,0 +1,226 @@
+"""
+Nearest-neighbour index over past projects.
+
+Projects are placed in a normalized (participants, budget, duration) space:
+log1p of each metric, standardized with the past projects' mean and std, so a
+neighbour is close on all three metrics at once rather than within a +/-20%
+window on one of them. One KD-tree is built per theme (plus one over all
+projects for themes with no history), and all queries for a theme are
+answered in a single call.
+
+CohortIndex partitions projects by cohort, so each cohort can be compared
+with the cohorts before it only.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from schema import label_key
+
+SIMILARITY_COLUMNS = ['participants', 'budget', 'duration']
+COHORT_COLUMN = 'cohort'
+
+
+def theme_keys(themes):
+    """Normalized theme of every label, normalizing each distinct label once."""
+    if isinstance(getattr(themes, 'dtype', None), pd.CategoricalDtype):
+        codes, uniques = themes.cat.codes.to_numpy(), themes.cat.categories
+    else:
+        codes, uniques = pd.factorize(np.asarray(themes, dtype=object))
+    keys = np.array([label_key(t) for t in uniques] + [None], dtype=object)
+    return keys[codes]
+
+
+class SimilarityIndex:
+    def __init__(self, values, themes=None, filter_by_theme=True, normalization=None):
+        """
+        values: (n, len(SIMILARITY_COLUMNS)) array of past project metrics.
+        themes: optional length-n sequence of theme labels.
+        normalization: optional (center, scale) of another index to share,
+        instead of standardizing with these projects' own mean and std.
+        """
+        self.values = np.asarray(values, dtype=float)
+        self.filter_by_theme = filter_by_theme and themes is not None
+        self.themes = theme_keys(themes) if themes is not None else None
+
+        if normalization is None:
+            logged = np.log1p(np.clip(self.values, 0, None))
+            center = np.nanmean(logged, axis=0) if len(logged) else np.zeros(logged.shape[1])
+            scale = np.nanstd(logged, axis=0) if len(logged) else np.ones(logged.shape[1])
+            scale[~(scale > 0)] = 1.0
+            normalization = center, scale
+        self._center, self._scale = normalization
+
+        self._valid = np.isfinite(self.values).all(axis=1)
+        self._points = np.where(self._valid[:, None], self._normalize(self.values), 0.0)
+        self._all = self._build(np.flatnonzero(self._valid))
+        self._trees = {}
+        if self.filter_by_theme:
+            for key in pd.unique(self.themes[self._valid]):
+                self._trees[key] = self._build(np.flatnonzero(self._valid & (self.themes == key)))
+
+    @classmethod
+    def from_frame(cls, past_df, filter_by_theme=True):
+        themes = past_df['theme'] if 'theme' in past_df.columns else None
+        return cls(past_df[SIMILARITY_COLUMNS].to_numpy(dtype=float), themes, filter_by_theme)
+
+    @classmethod
+    def from_chunks(cls, chunks, filter_by_theme=True):
+        """
+        Build the index from an iterable of past-project DataFrames, keeping
+        only the similarity metrics and theme of each chunk.
+        """
+        values, themes, has_themes = [], [], True
+        for chunk in chunks:
+            values.append(chunk[SIMILARITY_COLUMNS].to_numpy(dtype=float))
+            if 'theme' in chunk.columns:
+                themes.append(theme_keys(chunk['theme']))
+            else:
+                has_themes = False
+        values = np.concatenate(values) if values else np.empty((0, len(SIMILARITY_COLUMNS)))
+        themes = np.concatenate(themes) if has_themes and themes else None
+        return cls(values, themes, filter_by_theme)
+
+    def _normalize(self, values):
+        return (np.log1p(np.clip(values, 0, None)) - self._center) / self._scale
+
+    def _build(self, positions):
+        if len(positions) == 0:
+            return None
+        return KDTree(self._points[positions]), positions
+
+    def query(self, current_df, k):
+        """
+        Positions (into self.values) of the k nearest past projects for every
+        row of current_df, in row order. Missing query metrics are treated as
+        the past mean of that metric.
+        """
+        points = self._normalize(current_df[SIMILARITY_COLUMNS].to_numpy(dtype=float))
+        points = np.where(np.isfinite(points), points, 0.0)
+
+        if self.filter_by_theme and 'theme' in current_df.columns:
+            keys = theme_keys(current_df['theme'])
+        else:
+            keys = np.full(len(current_df), None, dtype=object)
+
+        results = [None] * len(current_df)
+        for key in pd.unique(keys):
+            rows = np.flatnonzero(keys == key)
+            entry = self._trees.get(key) if key is not None else None
+            if entry is None:
+                if key is not None:
+                    theme = current_df['theme'].iloc[rows[0]]
+                    print(f"  Warning: No past projects with theme '{theme}', using all projects")
+                entry = self._all
+            if entry is None:
+                for r in rows:
+                    results[r] = np.empty(0, dtype=np.intp)
+                continue
+
+            tree, positions = entry
+            _, neighbours = tree.query(points[rows], k=min(k, len(positions)))
+            for r, found in zip(rows, neighbours):
+                results[r] = positions[found]
+
+        return results
+
+
+class CohortIndex:
+    """
+    Projects of several cohorts, with one SimilarityIndex partition per
+    cohort. All partitions share the normalization of the oldest cohort, so
+    distances are comparable across them and no later cohort influences
+    them. A project is matched against the cohorts strictly before its own:
+    every earlier partition is searched and the k nearest across them kept.
+
+    Has the values / query() interface of SimilarityIndex, with query rows
+    carrying a COHORT_COLUMN, so one create_detailed_results pass covers
+    every cohort.
+    """
+
+    def __init__(self, values, cohorts, labels, themes=None, filter_by_theme=True):
+        """
+        values: (n, len(SIMILARITY_COLUMNS)) array of project metrics.
+        cohorts: length-n integer codes into labels, which are oldest first.
+        themes: optional length-n sequence of theme labels.
+        """
+        cohorts = np.asarray(cohorts)
+        order = np.argsort(cohorts, kind='stable')
+        self.labels = pd.Index(labels)
+        self.values = np.asarray(values, dtype=float)[order]
+        self.cohorts = cohorts[order]
+        self.filter_by_theme = filter_by_theme and themes is not None
+        themes = theme_keys(themes)[order] if themes is not None else None
+        self.offsets = np.searchsorted(self.cohorts, np.arange(len(self.labels) + 1))
+
+        self.partitions = []
+        normalization = None
+        for start, stop in zip(self.offsets[:-1], self.offsets[1:]):
+            partition = SimilarityIndex(self.values[start:stop], themes[start:stop] if themes is not None else None,
+                                        filter_by_theme, normalization)
+            normalization = partition._center, partition._scale
+            self.partitions.append(partition)
+
+    @classmethod
+    def from_frame(cls, df, filter_by_theme=True):
+        """Index a frame whose COHORT_COLUMN is an ordered categorical, oldest cohort first."""
+        cohorts = df[COHORT_COLUMN]
+        themes = df['theme'] if 'theme' in df.columns else None
+        return cls(df[SIMILARITY_COLUMNS].to_numpy(dtype=float), cohorts.cat.codes.to_numpy(),
+                   cohorts.cat.categories, themes, filter_by_theme)
+
+    def history_size(self, cohort):
+        """Number of projects in the cohorts before cohort."""
+        return int(self.offsets[self.labels.get_loc(cohort)])
+
+    def query(self, current_df, k):
+        """
+        Positions (into self.values) of the k nearest projects from earlier
+        cohorts for every row of current_df, in row order. Rows of the oldest
+        cohort have no history and get no neighbours.
+        """
+        codes = self.labels.get_indexer(current_df[COHORT_COLUMN])
+        if (codes < 0).any():
+            unknown = current_df[COHORT_COLUMN].iloc[np.flatnonzero(codes < 0)[0]]
+            raise ValueError(f"unknown cohort: {unknown!r}")
+
+        points = self.partitions[0]._normalize(current_df[SIMILARITY_COLUMNS].to_numpy(dtype=float))
+        points = np.where(np.isfinite(points), points, 0.0)
+
+        if self.filter_by_theme and 'theme' in current_df.columns:
+            keys = theme_keys(current_df['theme'])
+        else:
+            keys = np.full(len(current_df), None, dtype=object)
+
+        results = [np.empty(0, dtype=np.intp)] * len(current_df)
+        for code in np.unique(codes):
+            history = list(zip(self.offsets[:code], self.partitions[:code]))
+            in_cohort = codes == code
+            for key in pd.unique(keys[in_cohort]):
+                rows = np.flatnonzero(in_cohort & (keys == key))
+                entries = [(offset, p._trees.get(key)) for offset, p in history] if key is not None else []
+                if not any(entry is not None for _, entry in entries):
+                    if key is not None and history:
+                        theme = current_df['theme'].iloc[rows[0]]
+                        print(f"  Warning: No earlier projects with theme '{theme}' "
+                              f"before cohort '{self.labels[code]}', using all projects")
+                    entries = [(offset, p._all) for offset, p in history]
+
+                distances, found = [], []
+                for offset, entry in entries:
+                    if entry is None:
+                        continue
+                    tree, positions = entry
+                    dist, neighbours = tree.query(points[rows], k=min(k, len(positions)))
+                    distances.append(dist)
+                    found.append(offset + positions[neighbours])
+                if not found:
+                    continue
+
+                distances, found = np.hstack(distances), np.hstack(found)
+                nearest = np.argsort(distances, axis=1, kind='stable')[:, :k]
+                for r, positions in zip(rows, np.take_along_axis(found, nearest, axis=1)):
+                    results[r] = positions
+
+        return results